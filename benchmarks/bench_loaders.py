@@ -0,0 +1,66 @@
+"""
+Compare the YAML/JSON loaders over the bundled CWL corpus.
+
+Usage: python benchmarks/bench_loaders.py [--repeat N] [CORPUS_DIR]
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import timeit
+
+import yaml
+
+from cwl2wdl import loaders
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, os.pardir, "tests", "cwl")
+
+
+def corpus_documents(corpus_dir):
+    documents = []
+    for dirpath, dirnames, filenames in os.walk(corpus_dir):
+        for filename in sorted(filenames):
+            if filename.endswith((".cwl", ".cwl.yaml")):
+                with io.open(os.path.join(dirpath, filename), encoding="utf-8") as handle:
+                    documents.append(handle.read())
+    return documents
+
+
+def time_loader(load, documents, repeat):
+    return min(timeit.repeat(lambda: [load(d) for d in documents],
+                             number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("CORPUS_DIR", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=5)
+    arguments = parser.parse_args()
+
+    documents = corpus_documents(arguments.CORPUS_DIR)
+    json_documents = [json.dumps(yaml.load(d, Loader=yaml.SafeLoader), default=str)
+                      for d in documents]
+
+    print("%d documents, libyaml available: %s" % (len(documents), loaders.has_libyaml()))
+    baseline = time_loader(lambda d: yaml.load(d, Loader=yaml.SafeLoader),
+                           documents, arguments.repeat)
+    results = [
+        ("yaml SafeLoader (pure Python)", documents, baseline),
+        ("loaders.load_text", documents,
+         time_loader(loaders.load_text, documents, arguments.repeat)),
+        ("yaml SafeLoader, JSON documents", json_documents,
+         time_loader(lambda d: yaml.load(d, Loader=yaml.SafeLoader),
+                     json_documents, arguments.repeat)),
+        ("loaders.load_text, JSON documents", json_documents,
+         time_loader(loaders.load_text, json_documents, arguments.repeat)),
+    ]
+    for name, docs, seconds in results:
+        print("%-36s %8.2f ms  %6.1fx" % (name, seconds * 1000, baseline / seconds))
+
+
+if __name__ == "__main__":
+    main()
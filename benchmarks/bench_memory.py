@@ -0,0 +1,60 @@
+"""
+Measure the memory held by a parsed document and by its model, with
+tracemalloc, for a synthetic workflow with many steps.
+
+Usage: python benchmarks/bench_memory.py [--steps N] [--tools N] [--inputs N]
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import gc
+import shutil
+import tempfile
+import tracemalloc
+
+from cwl2wdl.base_classes import ParsedDocument
+from cwl2wdl.parsers import CwlParser
+from cwl2wdl.synthetic import SyntheticWorkflow
+
+
+def traced_mb():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=10000)
+    parser.add_argument("--tools", type=int, default=1000)
+    parser.add_argument("--inputs", type=int, default=10)
+    arguments = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        filename = SyntheticWorkflow(steps=arguments.steps, inputs=arguments.inputs,
+                                     tools=arguments.tools).write(directory)
+        tracemalloc.start()
+        start = traced_mb()
+        parsed_doc = CwlParser(filename).parse_document()
+        parsed = traced_mb()
+        model = ParsedDocument(parsed_doc)
+        both = traced_mb()
+        del parsed_doc
+        model_only = traced_mb()
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(directory)
+
+    print("%d steps, %d tools with %d inputs" %
+          (arguments.steps, arguments.tools, arguments.inputs))
+    print("%-30s %8.1f MB" % ("parsed document", parsed - start))
+    print("%-30s %8.1f MB" % ("model", both - parsed))
+    print("%-30s %8.1f MB" % ("model, parsed document dropped", model_only - start))
+    print("%-30s %8.1f MB" % ("peak", peak - start))
+    assert model is not None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Scaling curves of parse time, generation time and peak memory over
+synthetic workflows of growing size.
+
+Usage: python benchmarks/bench_scaling.py [--steps 100,1000,5000] [--depth N]
+           [--fan-in N] [--fan-out N] [--scatter X] [--tools N] [--json]
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from cwl2wdl.base_classes import ParsedDocument
+from cwl2wdl.main import write_wdl
+from cwl2wdl.parsers import CwlParser
+from cwl2wdl.synthetic import SyntheticWorkflow
+
+
+def measure(synthetic):
+    directory = tempfile.mkdtemp()
+    try:
+        filename = synthetic.write(directory)
+        tracemalloc.start()
+        start = time.time()
+        parsed_cwl = ParsedDocument(CwlParser(filename).parse_document())
+        parse_seconds = time.time() - start
+
+        start = time.time()
+        write_wdl(parsed_cwl, io.StringIO())
+        generate_seconds = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(directory)
+    return {"parse": parse_seconds, "generate": generate_seconds,
+            "peak_mb": peak / (1024 * 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=str, default="100,500,1000,5000",
+                        help="comma separated workflow sizes")
+    parser.add_argument("--inputs", type=int, default=4)
+    parser.add_argument("--fan-in", type=int, default=1)
+    parser.add_argument("--fan-out", type=int, default=1)
+    parser.add_argument("--scatter", type=float, default=0.0)
+    parser.add_argument("--depth", type=int, default=0)
+    parser.add_argument("--tools", type=int, default=None)
+    parser.add_argument("--json", action="store_true",
+                        help="print the curves as JSON")
+    arguments = parser.parse_args()
+
+    curve = []
+    for steps in [int(s) for s in arguments.steps.split(",")]:
+        synthetic = SyntheticWorkflow(steps, arguments.inputs, arguments.fan_in,
+                                      arguments.fan_out, arguments.scatter,
+                                      arguments.depth, arguments.tools)
+        point = measure(synthetic)
+        point["steps"] = steps
+        curve.append(point)
+        if not arguments.json:
+            print("%6d steps  parse %8.3f s  generate %8.3f s  peak %8.1f MB" %
+                  (steps, point["parse"], point["generate"], point["peak_mb"]))
+    if arguments.json:
+        print(json.dumps(curve, indent=1))
+
+
+if __name__ == "__main__":
+    main()
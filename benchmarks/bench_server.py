@@ -0,0 +1,118 @@
+"""
+Compare conversion throughput of the one-shot CLI and the conversion server.
+
+Usage: python benchmarks/bench_server.py [--requests N] [--clients N] [FILE ...]
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from cwl2wdl.server import ConversionClient, RequestError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, os.pardir)
+DEV_SCRIPT = os.path.join(ROOT, "cwl2wdl_dev.py")
+# the samtools tools, without the requirement fragment they import
+DEFAULT_FILES = sorted(f for f in glob.glob(os.path.join(ROOT, "tests", "cwl", "tools",
+                                                         "samtools-*.cwl"))
+                       if not f.endswith("-docker.cwl"))
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 1).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def one_shot(files, requests):
+    """Return the seconds taken and the number of failed conversions."""
+    failed = 0
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        for i in range(requests):
+            if subprocess.call([sys.executable, DEV_SCRIPT, files[i % len(files)],
+                                "--no-cache"],
+                               stdout=devnull, stderr=devnull) != 0:
+                failed += 1
+        return time.time() - start, failed
+
+
+def served(files, requests, clients, port):
+    """Return the seconds taken and the number of failed conversions."""
+    errors = []
+
+    def worker(offset):
+        client = ConversionClient(port=port)
+        for i in range(offset, requests, clients):
+            try:
+                client.convert_file(files[i % len(files)])
+            except RequestError as e:
+                errors.append("%s: %s" % (files[i % len(files)], e))
+        client.close()
+
+    start = time.time()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for error in sorted(set(errors)):
+        print("FAIL %s" % (error), file=sys.stderr)
+    return time.time() - start, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("FILE", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=4)
+    arguments = parser.parse_args()
+
+    port = free_port()
+    with open(os.devnull, "w") as devnull:
+        server = subprocess.Popen([sys.executable, DEV_SCRIPT, "serve",
+                                   "--port", str(port), "--no-cache"],
+                                  stderr=devnull)
+    try:
+        wait_for_server(port)
+        cli_seconds, cli_failed = one_shot(arguments.FILE, arguments.requests)
+        server_seconds, server_failed = served(arguments.FILE, arguments.requests,
+                                               arguments.clients, port)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print("%d conversions of %d files" % (arguments.requests, len(arguments.FILE)))
+    # only successful conversions count towards the throughput
+    for name, seconds, failed in [
+            ("one-shot CLI", cli_seconds, cli_failed),
+            ("server, %d clients" % (arguments.clients), server_seconds, server_failed)]:
+        print("%-20s %8.2f s  %8.1f conversions/s  %d failed" %
+              (name, seconds, (arguments.requests - failed) / seconds, failed))
+    if cli_failed or server_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
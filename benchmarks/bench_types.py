@@ -0,0 +1,173 @@
+"""
+Time the resolution of every input and output type of the bundled CWL
+corpus: with the type resolution the parser used before cwl2wdl.typemap, and
+with typemap cold, without its memo and memoized. Speedups are relative to
+the previous resolution, over the types it could resolve.
+
+Usage: python benchmarks/bench_types.py [--repeat N] [--number N] [CORPUS_DIR]
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import timeit
+
+from cwl2wdl import typemap
+from cwl2wdl.loaders import load_file
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(HERE, os.pardir, "tests", "cwl")
+
+
+def corpus_types(corpus_dir):
+    """The type expressions of every input and output in the corpus, in
+    document order and with repeats, as a conversion sees them."""
+    types = []
+    for dirpath, dirnames, filenames in os.walk(corpus_dir):
+        for filename in sorted(filenames):
+            if not filename.endswith((".cwl", ".cwl.yaml")):
+                continue
+            try:
+                cwl = load_file(os.path.join(dirpath, filename))
+            except Exception:
+                continue
+            pending = [cwl]
+            while pending:
+                node = pending.pop()
+                if isinstance(node, list):
+                    pending.extend(node)
+                elif isinstance(node, dict):
+                    for key in ("inputs", "outputs"):
+                        if isinstance(node.get(key), list):
+                            types += [p["type"] for p in node[key]
+                                      if isinstance(p, dict) and "type" in p]
+                    pending.extend(node.get("$graph", []))
+                    pending.extend(node.get("steps", []))
+    return types
+
+
+def resolvable(types, resolve):
+    found = []
+    for cwl_type in types:
+        try:
+            resolve(cwl_type)
+            found.append(cwl_type)
+        except Exception:
+            pass
+    return found
+
+
+############################
+# Helper functions
+
+# CwlParser.__check_if_required and __remap_type_cwl2wdl as they were before
+# cwl2wdl.typemap, the baseline of the timings
+
+def previous_check_if_required(input_type):
+    if isinstance(input_type, list):
+        return 'null' not in input_type
+    elif isinstance(input_type, dict):
+        return previous_check_if_required(input_type['type'])
+    return input_type != 'null'
+
+
+def previous_remap_type(input_type):
+    type_map = {"File": "File",
+                "string": "String",
+                "boolean": "Boolean",
+                "int": "Int",
+                "long": "Float",
+                "float": "Float",
+                "double": "Float",
+                "array-File": "Array[File]",
+                "array-string": "Array[String]",
+                "array-int": "Array[Int]",
+                "array-long": "Array[Float]",
+                "array-float": "Array[Float]",
+                "array-double": "Array[Float]"}
+
+    if isinstance(input_type, str):
+        cwl_type = input_type
+
+    elif isinstance(input_type, list):
+        if 'null' in input_type:
+            cwl_type = [i for i in input_type if i != 'null'][0]
+
+        if isinstance(cwl_type, dict):
+            if cwl_type['type'] == "array":
+                cwl_type = "-".join([cwl_type['type'], cwl_type['items']])
+            elif cwl_type['type'] in ("enum", "record"):
+                raise KeyError('Unsupported CWL type: %s' % (cwl_type['type']))
+
+    elif isinstance(input_type, dict):
+        if input_type['type'] == "array":
+            cwl_type = "-".join([input_type['type'], input_type['items']])
+        elif input_type['type'] in ("enum", "record"):
+            raise KeyError('Unsupported CWL type: %s' % (input_type['type']))
+
+    try:
+        return type_map[cwl_type]
+    except KeyError:
+        raise KeyError('Unrecognized CWL type: %s' % (cwl_type))
+
+
+def previous_resolve_type(cwl_type):
+    return previous_remap_type(cwl_type), previous_check_if_required(cwl_type)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("CORPUS_DIR", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=100,
+                        help="passes over the corpus types per timing")
+    arguments = parser.parse_args()
+
+    all_types = corpus_types(arguments.CORPUS_DIR)
+    types = resolvable(all_types, previous_resolve_type)
+    print("%d types, %d resolvable before typemap, %d with it" %
+          (len(all_types), len(types),
+           len(resolvable(all_types, typemap.resolve_type))))
+    print("%d distinct signatures" %
+          len(set(typemap.canonical_type(t) for t in types)))
+    for cwl_type in types:
+        if typemap.resolve_type(cwl_type) != previous_resolve_type(cwl_type):
+            raise AssertionError("%r resolves to %r, was %r" % (
+                cwl_type, typemap.resolve_type(cwl_type),
+                previous_resolve_type(cwl_type)))
+
+    def previous():
+        for cwl_type in types:
+            previous_resolve_type(cwl_type)
+
+    def uncached():
+        for cwl_type in types:
+            typemap._resolve(typemap.canonical_type(cwl_type))
+
+    def cold():
+        # as in one conversion per process
+        typemap.clear_resolved_types()
+        for cwl_type in types:
+            typemap.resolve_type(cwl_type)
+
+    def memoized():
+        for cwl_type in types:
+            typemap.resolve_type(cwl_type)
+
+    results = []
+    for name, function in (("previous parser methods", previous),
+                           ("typemap, no memo", uncached),
+                           ("resolve_type, cold memo", cold),
+                           ("resolve_type, memoized", memoized)):
+        seconds = min(timeit.repeat(function, number=arguments.number,
+                                    repeat=arguments.repeat))
+        results.append((name, seconds / (arguments.number * len(types))))
+
+    baseline = results[0][1]
+    for name, seconds in results:
+        print("%-28s %8.3f us/type  %6.1fx" % (name, seconds * 1e6, baseline / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Check the cold-start import cost of the cwl2wdl command against a budget.
+
+Each scenario is run with `python -X importtime`. The import time of the
+interpreter itself (`python -c pass`) is subtracted, the best of --repeat
+runs is compared with the scenario's budget, and modules that the scenario
+must not load at all (e.g. PyWDL for a plain conversion) are reported.
+Exits non-zero if any scenario is over budget or loads a forbidden module.
+
+On slow or noisy machines (e.g. shared CI runners) scale every budget with
+--scale or the CWL2WDL_IMPORT_BUDGET_SCALE environment variable.
+
+Usage: python benchmarks/check_import_time.py [--repeat N] [--scale X]
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.normpath(os.path.join(HERE, os.pardir))
+DEV_SCRIPT = os.path.join(ROOT, "cwl2wdl_dev.py")
+SAMPLE = os.path.join(ROOT, "tests", "cwl", "tools", "samtools-index.cwl")
+
+# name, arguments, budget in ms, top-level modules that must not be imported
+SCENARIOS = [
+    ("cwl2wdl --version", [DEV_SCRIPT, "--version"], 60,
+     ["yaml", "wdl", "multiprocessing"]),
+    ("cwl2wdl tool.cwl", [DEV_SCRIPT, SAMPLE, "--no-cache"], 75,
+     ["wdl", "multiprocessing"]),
+]
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(arguments):
+    """Return {module: cumulative microseconds} of the top-level imports, and
+    the names of all imported modules."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+    process = subprocess.Popen([sys.executable, "-X", "importtime"] + arguments,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               env=env, cwd=ROOT)
+    stderr = process.communicate()[1].decode("utf-8")
+    if process.returncode != 0:
+        raise RuntimeError("%s failed:\n%s" % (" ".join(arguments), stderr))
+
+    times = {}
+    modules = set()
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        modules.add(match.group(4))
+        # nested imports are already part of their parent's cumulative time
+        if match.group(3) == " ":
+            times[match.group(4)] = int(match.group(2))
+    return times, modules
+
+
+def best_time(arguments, repeat, baseline=0):
+    """Best total import time in ms of repeat runs, and the top-level import
+    times and imported modules of the last run."""
+    best = None
+    for _ in range(repeat):
+        times, modules = import_times(arguments)
+        total = sum(times.values()) / 1000 - baseline
+        best = total if best is None else min(best, total)
+    return best, times, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="runs per scenario, the best is kept")
+    parser.add_argument("--scale", type=float,
+                        default=float(os.environ.get("CWL2WDL_IMPORT_BUDGET_SCALE", 1.0)),
+                        help="multiply every budget, for slow machines "
+                        "(default: $CWL2WDL_IMPORT_BUDGET_SCALE or 1)")
+    arguments = parser.parse_args()
+
+    # compile the package up front, otherwise a stale bytecode cache is
+    # measured rather than the imports
+    import compileall
+    compileall.compile_dir(os.path.join(ROOT, "cwl2wdl"), quiet=1)
+
+    baseline = best_time(["-c", "pass"], arguments.repeat)[0]
+    failed = False
+    for name, scenario, budget, forbidden in SCENARIOS:
+        budget = budget * arguments.scale
+        total, times, modules = best_time(scenario, arguments.repeat, baseline)
+        loaded = [m for m in forbidden if m in modules]
+        ok = total <= budget and not loaded
+        failed = failed or not ok
+
+        print("%s %-20s %6.1f ms (budget %.0f ms)" %
+              ("PASS" if ok else "FAIL", name, total, budget))
+        if loaded:
+            print("     loads %s" % (", ".join(loaded)))
+        if total > budget:
+            slowest = sorted(times.items(), key=lambda t: -t[1])[:5]
+            print("     slowest: %s" % (", ".join("%s %.1f ms" % (m, t / 1000)
+                                                  for m, t in slowest)))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
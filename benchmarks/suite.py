@@ -0,0 +1,265 @@
+"""
+Benchmark suite timing each conversion phase over the bundled CWL corpus.
+
+    python benchmarks/suite.py run [--repeat N] [--validate] [-o results.json]
+    python benchmarks/suite.py compare BASE.json NEW.json [--threshold 0.1]
+                                   [--min-time 0.002]
+
+`run` converts every tool in tests/cwl/tools and every document in
+tests/cwl/workflows and records, per document, the best and the median of
+--repeat timings of each phase: loading the import tree,
+CwlParser.parse_document, ParsedDocument construction, WDL generation and
+optionally PyWDL validation. The garbage collector is paused while a
+conversion is timed, as timeit does.
+
+`compare` reports the phases whose best time got slower by more than
+--threshold between two runs, and exits non-zero if there are any. A
+slowdown also has to exceed a noise floor: --min-time, or how far the
+medians of either run lie above their best times, whichever is larger.
+Two runs of the same code therefore compare clean.
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import cwl2wdl
+from cwl2wdl.base_classes import ParsedDocument
+from cwl2wdl.batch import find_cwl_files
+from cwl2wdl.main import write_wdl
+from cwl2wdl.parsers import CwlParser, ImportRegistry, clear_requirement_imports
+from cwl2wdl.typemap import clear_resolved_types
+from cwl2wdl.validation import parse_wdl
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.normpath(os.path.join(HERE, os.pardir, "tests", "cwl"))
+CORPUS_DIRS = [os.path.join(CORPUS, "tools"), os.path.join(CORPUS, "workflows")]
+
+# bump when the layout of the results changes
+RESULTS_FORMAT = 2
+
+PHASES = ["load", "parse", "model", "generate", "validate"]
+
+
+def time_phases(filename, validate=False):
+    """Time one cold conversion of filename. Returns {phase: seconds} and
+    the validation error, if any."""
+    timings = {}
+    # requirement imports and types are otherwise remembered across
+    # conversions
+    clear_requirement_imports()
+    clear_resolved_types()
+    gc.collect()
+    gc.disable()
+    try:
+        return _time_phases(filename, validate, timings)
+    finally:
+        gc.enable()
+
+
+def _time_phases(filename, validate, timings):
+    start = time.time()
+    registry = ImportRegistry()
+    registry.prefetch(filename)
+    timings["load"] = time.time() - start
+
+    start = time.time()
+    parsed_doc = CwlParser(filename, registry).parse_document()
+    timings["parse"] = time.time() - start
+
+    start = time.time()
+    parsed_cwl = ParsedDocument(parsed_doc)
+    timings["model"] = time.time() - start
+
+    start = time.time()
+    out = io.StringIO()
+    write_wdl(parsed_cwl, out)
+    timings["generate"] = time.time() - start
+
+    if validate:
+        start = time.time()
+        try:
+            parse_wdl(out.getvalue())
+        except Exception as e:
+            # the generated WDL is invalid, the other phases still count
+            return timings, "%s: %s" % (type(e).__name__, e)
+        timings["validate"] = time.time() - start
+    return timings, None
+
+
+def benchmark_file(filename, repeat, validate=False):
+    """Best timing of each phase over repeat conversions, with the median of
+    each under "median", or the error."""
+    runs = {}
+    try:
+        for _ in range(repeat):
+            timings, validation_error = time_phases(filename, validate)
+            for phase, seconds in timings.items():
+                runs.setdefault(phase, []).append(seconds)
+    except Exception as e:
+        return {"error": "%s: %s" % (type(e).__name__, e)}
+    best = dict((phase, min(seconds)) for phase, seconds in runs.items())
+    best["median"] = dict((phase, median(seconds)) for phase, seconds in runs.items())
+    if validation_error is not None:
+        best["validation_error"] = validation_error
+    return best
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def run(arguments):
+    results = {}
+    for source, relpath in find_cwl_files(CORPUS_DIRS):
+        name = os.path.relpath(source, CORPUS)
+        results[name] = benchmark_file(source, arguments.repeat, arguments.validate)
+        if not arguments.quiet:
+            status = results[name].get("error") or "%.2f ms" % (
+                sum(results[name].get(p, 0) for p in PHASES) * 1000)
+            print("%-60s %s" % (name, status), file=sys.stderr)
+
+    totals = {"median": {}}
+    for timings in results.values():
+        if "error" in timings:
+            continue
+        for phase in PHASES:
+            if phase in timings:
+                totals[phase] = totals.get(phase, 0.0) + timings[phase]
+                totals["median"][phase] = (totals["median"].get(phase, 0.0) +
+                                           timings["median"][phase])
+
+    report = {"format": RESULTS_FORMAT,
+              "version": cwl2wdl.__version__,
+              "python": platform.python_version(),
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "repeat": arguments.repeat,
+              "results": results,
+              "totals": totals}
+    text = json.dumps(report, indent=1, sort_keys=True)
+    if arguments.output is not None:
+        with io.open(arguments.output, "w", encoding="utf-8") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+
+
+def load_report(filename):
+    with io.open(filename, encoding="utf-8") as handle:
+        report = json.load(handle)
+    if report.get("format") != RESULTS_FORMAT:
+        raise ValueError("%s has an unknown results format." % (filename))
+    return report
+
+
+def compare_timings(base, new, threshold, min_time):
+    """Return (phase, base, new) for every phase of new that is more than
+    threshold slower than in base. Differences under the noise floor are
+    ignored: min_time seconds, or the spread between the median and the best
+    time of either run, if the timings carry their medians."""
+    regressions = []
+    for phase in PHASES:
+        if phase in base and phase in new:
+            noise = max([min_time] +
+                        [t["median"][phase] - t[phase] for t in (base, new)
+                         if phase in t.get("median", {})])
+            if new[phase] > base[phase] * (1 + threshold) and \
+               new[phase] - base[phase] > noise:
+                regressions.append((phase, base[phase], new[phase]))
+    return regressions
+
+
+def compare(arguments):
+    base = load_report(arguments.BASE)
+    new = load_report(arguments.NEW)
+
+    regressions = []
+    for name in sorted(new["results"]):
+        if name not in base["results"]:
+            continue
+        base_timings = base["results"][name]
+        new_timings = new["results"][name]
+        if "error" in new_timings:
+            if "error" not in base_timings:
+                regressions.append((name, "error", new_timings["error"]))
+            continue
+        if "error" in base_timings:
+            continue
+        if "validation_error" in new_timings and "validation_error" not in base_timings:
+            regressions.append((name, "validate", new_timings["validation_error"]))
+        for phase, before, after in compare_timings(base_timings, new_timings,
+                                                    arguments.threshold,
+                                                    arguments.min_time):
+            regressions.append((name, phase, "%.2f ms -> %.2f ms (%+.0f%%)" %
+                                (before * 1000, after * 1000,
+                                 (after / before - 1) * 100)))
+
+    print("%-10s %12s %12s %8s" % ("phase", "base", "new", "change"))
+    for phase in PHASES:
+        if phase in base["totals"] and phase in new["totals"]:
+            before, after = base["totals"][phase], new["totals"][phase]
+            print("%-10s %9.2f ms %9.2f ms %+7.0f%%" %
+                  (phase, before * 1000, after * 1000,
+                   (after / before - 1) * 100 if before else 0))
+    for phase, before, after in compare_timings(base["totals"], new["totals"],
+                                                arguments.threshold,
+                                                arguments.min_time):
+        regressions.append(("total", phase, "%.2f ms -> %.2f ms" %
+                            (before * 1000, after * 1000)))
+
+    if regressions:
+        print("\n%d regressions:" % (len(regressions)))
+        for name, phase, detail in regressions:
+            print("  %s [%s] %s" % (name, phase, detail))
+        sys.exit(1)
+    print("\nno regressions")
+
+
+def collect_args():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="time the corpus")
+    run_parser.add_argument("--repeat", type=int, default=5,
+                            help="conversions per document, the best is kept")
+    run_parser.add_argument("--validate", action="store_true",
+                            help="time PyWDL validation too")
+    run_parser.add_argument("-o", "--output", type=str, default=None,
+                            help="write the results to this file instead of stdout")
+    run_parser.add_argument("-q", "--quiet", action="store_true",
+                            help="don't report progress")
+
+    compare_parser = commands.add_parser("compare",
+                                         help="flag regressions between two runs")
+    compare_parser.add_argument("BASE", type=str, help="results of the baseline")
+    compare_parser.add_argument("NEW", type=str, help="results to check")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative slowdown counted as a regression")
+    compare_parser.add_argument("--min-time", type=float, default=0.002,
+                                help="ignore slowdowns under this many seconds, "
+                                "or under the spread of the timings if larger")
+    return parser
+
+
+def main():
+    arguments = collect_args().parse_args()
+    if arguments.command == "run":
+        run(arguments)
+    else:
+        compare(arguments)
+
+
+if __name__ == "__main__":
+    main()
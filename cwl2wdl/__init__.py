@@ -8,3 +8,11 @@ try:
     __version__ = _version.version
 except ImportError:
     pass
+
+
+def convert(cwl, resolver=None, name="main.cwl", diagnostics=None):
+    """Convert a CWL document and return the WDL text, see
+    cwl2wdl.main.convert. The conversion modules are only imported on the
+    first call, so importing the package stays cheap."""
+    from cwl2wdl.main import convert
+    return convert(cwl, resolver, name, diagnostics)
@@ -8,17 +8,28 @@ from __future__ import unicode_literals
 
 
 class ParsedDocument(object):
-    """Expects a parsed CWL document"""
+    """Expects a parsed CWL document.
+
+    The model keeps no reference to the parsed dicts, so they can be dropped
+    once it is built. Model classes use __slots__, which matters for
+    workflows with tens of thousands of steps.
+    """
+    __slots__ = ("imports", "tasks", "workflow")
+
     def __init__(self, parsed_doc):
         self.imports = None
+        # the tools of a packed document are also the definitions of the
+        # steps calling them
+        definitions = {}
 
-        if (parsed_doc['tasks'] is None) and (parsed_doc['workflows'] is None):
+        if (parsed_doc['tasks'] is None) and (parsed_doc['workflow'] is None):
             raise ImportError("Cannot convert NoneType to ParsedDocumentType.")
 
         if parsed_doc['tasks'] is not None:
             if isinstance(parsed_doc['tasks'], list):
                 if all(isinstance(t, dict) for t in parsed_doc['tasks']):
-                    self.tasks = [Task(t) for t in parsed_doc['tasks']]
+                    self.tasks = [shared_definition(definitions, t, Task)
+                                  for t in parsed_doc['tasks']]
                 else:
                     raise TypeError
             else:
@@ -28,7 +39,7 @@ class ParsedDocument(object):
 
         if parsed_doc['workflow'] is not None:
             if isinstance(parsed_doc['workflow'], dict):
-                self.workflow = Workflow(parsed_doc['workflow'])
+                self.workflow = Workflow(parsed_doc['workflow'], definitions)
             else:
                 raise TypeError
         else:
@@ -36,12 +47,16 @@ class ParsedDocument(object):
 
 
 class Task(object):
+    __slots__ = ("name", "command", "inputs", "outputs", "requirements",
+                 "stdin", "stdout")
+
     def __init__(self, parsed_task):
         self.name = parsed_task['name']
+        self.inputs = [Input(i) for i in parsed_task['inputs']]
+        # the command binds the task's own inputs
         self.command = Command(parsed_task['baseCommand'],
                                parsed_task['arguments'],
-                               parsed_task['inputs'])
-        self.inputs = [Input(i) for i in parsed_task['inputs']]
+                               self.inputs)
         self.outputs = [Output(o) for o in parsed_task['outputs']]
         self.requirements = [Requirement(r) for r in parsed_task['requirements']]
         self.stdin = parsed_task['stdin']
@@ -49,6 +64,9 @@ class Task(object):
 
 
 class Input(object):
+    __slots__ = ("name", "prefix", "position", "separator", "default",
+                 "variable_type", "is_required", "separate")
+
     def __init__(self, input_dict):
         self.name = input_dict['name']
         self.prefix = input_dict['prefix']
@@ -61,6 +79,9 @@ class Input(object):
 
 
 class Command(object):
+    """inputs are the Input objects of the task"""
+    __slots__ = ("baseCommand", "arguments", "inputs")
+
     def __init__(self, baseCommand, arguments, inputs):
         if isinstance(baseCommand, list):
             self.baseCommand = " ".join(baseCommand)
@@ -68,17 +89,22 @@ class Command(object):
             self.baseCommand = baseCommand
 
         self.arguments = [Argument(a) for a in arguments]
-        self.inputs = [Input(i) for i in inputs]
+        self.inputs = inputs
 
 
 class Argument(object):
+    __slots__ = ("prefix", "position", "value", "separate")
+
     def __init__(self, argument_dict):
         self.prefix = argument_dict['prefix']
         self.position = argument_dict['position']
         self.value = argument_dict['value']
+        self.separate = argument_dict.get("separate", True)
 
 
 class Output(object):
+    __slots__ = ("name", "output", "variable_type", "is_required")
+
     def __init__(self, output_dict):
         self.name = output_dict['name']
         self.output = output_dict['output']
@@ -87,36 +113,75 @@ class Output(object):
 
 
 class Requirement(object):
+    __slots__ = ("requirement_type", "value")
+
     def __init__(self, cwl_requirement):
         self.requirement_type = cwl_requirement['requirement_type']
         self.value = cwl_requirement['value']
 
 
+def shared_definition(definitions, parsed_definition, model_class):
+    """Build a Task or Workflow once per parsed definition.
+
+    The parser hands out the same dict for every step importing the same
+    file, so the model objects are shared as well. definitions maps
+    id(parsed_definition) to (parsed_definition, model).
+    """
+    key = id(parsed_definition)
+    if key not in definitions:
+        if model_class is Workflow:
+            model = Workflow(parsed_definition, definitions)
+        else:
+            model = model_class(parsed_definition)
+        definitions[key] = (parsed_definition, model)
+    return definitions[key][1]
+
+
 class Workflow(object):
-    def __init__(self, parsed_workflow):
+    __slots__ = ("name", "inputs", "outputs", "steps", "subworkflows",
+                 "requirements")
+
+    def __init__(self, parsed_workflow, definitions=None):
+        if definitions is None:
+            definitions = {}
         self.name = parsed_workflow['name']
         self.inputs = [Input(i) for i in parsed_workflow['inputs']]
         self.outputs = [Output(o) for o in parsed_workflow['outputs']]
-        self.steps = [Step(s) for s in parsed_workflow['steps']]
-        self.subworkflows = [SubWorkflow(w) for w in parsed_workflow.get("subworkflows", [])]
+        self.steps = [Step(s, definitions) for s in parsed_workflow['steps']]
+        self.subworkflows = [SubWorkflow(w, definitions) for w in parsed_workflow.get("subworkflows", [])]
         self.requirements = [Requirement(r) for r in parsed_workflow['requirements']]
 
 class SubWorkflow(object):
     """Step where we call a workflow from another workflow.
     """
-    def __init__(self, step):
+    __slots__ = ("step_type", "task_id", "step_id", "task_definition",
+                 "inputs", "outputs", "scatter")
+
+    def __init__(self, step, definitions=None):
         self.step_type = "workflow"
         self.task_id = step["id"]
-        self.task_definition = Workflow(step["definition"])
+        self.step_id = step.get("step_id", self.task_id)
+        self.task_definition = shared_definition(
+            definitions if definitions is not None else {},
+            step["definition"], Workflow)
         self.inputs = [StepInput(i) for i in step['inputs']]
         self.outputs = [StepOutput(o) for o in step['outputs']]
         self.scatter = step.get("scatter", [])
 
 class Step(object):
-    def __init__(self, workflow_step):
+    __slots__ = ("step_type", "task_id", "step_id", "task_definition",
+                 "import_statement", "inputs", "outputs", "scatter")
+
+    def __init__(self, workflow_step, definitions=None):
         self.step_type = "task"
         self.task_id = workflow_step['task_id']
-        self.task_definition = Task(workflow_step['task_definition']) if workflow_step['task_definition'] is not None else None
+        self.step_id = workflow_step.get('step_id', self.task_id)
+        if workflow_step['task_definition'] is not None:
+            self.task_definition = shared_definition(
+                definitions if definitions is not None else {},
+                workflow_step['task_definition'], Task)
+        else:
+            self.task_definition = None
         self.import_statement = workflow_step.get('import_statement', "")
         self.inputs = [StepInput(i) for i in workflow_step['inputs']]
         self.outputs = [StepOutput(o) for o in workflow_step['outputs']]
@@ -124,11 +189,16 @@ class Step(object):
 
 
 class StepInput(object):
+    __slots__ = ("input_id", "value", "source")
+
     def __init__(self, input_dict):
         self.input_id = input_dict['id']
         self.value = input_dict['value']
+        self.source = tuple(input_dict.get('source', ()))
 
 
 class StepOutput(object):
+    __slots__ = ("output_id",)
+
     def __init__(self, output_dict):
         self.output_id = output_dict['id']
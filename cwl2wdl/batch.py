@@ -0,0 +1,296 @@
+"""
+Convert whole trees of CWL documents using a pool of worker processes.
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import glob
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import argparse
+
+from cwl2wdl.diagnostics import Diagnostics
+from cwl2wdl.incremental import BuildState, STATE_FILENAME
+from cwl2wdl.loaders import MultipleDocumentsError
+from cwl2wdl.main import (add_cache_args, cache_from_args,
+                          parse_file_and_dependencies, write_wdl,
+                          write_wdl_stream)
+from cwl2wdl.resolvers import FileResolver
+
+
+CWL_EXTENSIONS = (".cwl.yaml", ".cwl")
+
+ConversionResult = collections.namedtuple(
+    "ConversionResult", ["source", "output", "error", "seconds", "dependencies",
+                         "diagnostics", "fingerprints"]
+)
+
+# overwrites an existing file on every platform; Python 2 only has os.rename,
+# which doesn't on Windows
+replace_file = getattr(os, "replace", os.rename)
+
+
+def collect_args():
+    parser = argparse.ArgumentParser(
+        prog="cwl2wdl batch",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser._optionals.title = "Options"
+    parser.add_argument("PATH", type=str, nargs="+",
+                        help="CWL files, directories or glob patterns.")
+    parser.add_argument("-o", "--outdir", type=str, required=True,
+                        help="directory the WDL tree is written to")
+    parser.add_argument("-j", "--jobs", type=int,
+                        default=multiprocessing.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only report failed conversions")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only convert documents whose source files changed "
+                        "since the last run (tracked in OUTDIR/%s)" % (STATE_FILENAME))
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and incrementally re-convert "
+                        "whenever source files change")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between checks for changes with --watch")
+    parser.add_argument("--diagnostics", type=str, default=None, metavar="FILE",
+                        help="write the warnings of every conversion to this "
+                        "file as JSON")
+    add_cache_args(parser)
+    return parser
+
+
+def is_cwl_file(filename):
+    return filename.endswith(CWL_EXTENSIONS)
+
+
+def wdl_filename(filename):
+    """Swap the CWL extension of filename for .wdl"""
+    for ext in CWL_EXTENSIONS:
+        if filename.endswith(ext):
+            return filename[:-len(ext)] + ".wdl"
+    return filename + ".wdl"
+
+
+def _walk_cwl_files(directory):
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if is_cwl_file(filename):
+                yield os.path.join(dirpath, filename)
+
+
+def find_cwl_files(paths):
+    """Expand files, directories and glob patterns into (source, relative path)
+    pairs. The relative path is used to mirror the source layout in the
+    output directory."""
+    found = collections.OrderedDict()
+    for path in paths:
+        if glob.has_magic(path):
+            root = path
+            while glob.has_magic(root):
+                root = os.path.dirname(root)
+            matches = sorted(glob.glob(path))
+        else:
+            root = path if os.path.isdir(path) else os.path.dirname(path)
+            matches = [path]
+
+        for match in matches:
+            if os.path.isdir(match):
+                candidates = _walk_cwl_files(match)
+            elif os.path.exists(match):
+                candidates = [match]
+            else:
+                raise IOError("%s does not exist." % (match))
+
+            for source in candidates:
+                key = os.path.abspath(source)
+                if key not in found:
+                    found[key] = os.path.relpath(source, root or os.curdir)
+    return list(found.items())
+
+
+def convert_to_file(job):
+    """Worker entry point. Converts one CWL document and writes the result.
+    If asked to, the files read are fingerprinted before they are read."""
+    source, output, cache, with_fingerprints = job
+    start = time.time()
+    dependencies = [os.path.abspath(source)]
+    diagnostics = Diagnostics()
+    fingerprints = {} if with_fingerprints else None
+    try:
+        try:
+            parsed_cwl, dependencies = parse_file_and_dependencies(
+                source, cache, diagnostics, fingerprints=fingerprints
+            )
+        except MultipleDocumentsError:
+            # converted document by document while writing
+            parsed_cwl = None
+        outdir = os.path.dirname(output)
+        if outdir and not os.path.isdir(outdir):
+            try:
+                os.makedirs(outdir)
+            except OSError:
+                # another worker may have created it in the meantime
+                if not os.path.isdir(outdir):
+                    raise
+        # written beside the output and renamed into place once complete, so
+        # a failure neither leaves a truncated document behind nor removes
+        # the output of an earlier run
+        handle, tmp_file = tempfile.mkstemp(dir=outdir or None, suffix=".tmp")
+        try:
+            with io.open(handle, "w", encoding="utf-8") as out:
+                if parsed_cwl is not None:
+                    write_wdl(parsed_cwl, out)
+                else:
+                    dependencies = write_wdl_stream(
+                        source, out, diagnostics,
+                        FileResolver(fingerprints=fingerprints)
+                    )
+            replace_file(tmp_file, output)
+        except Exception:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            raise
+        error = None
+    except Exception as e:
+        error = "%s: %s" % (type(e).__name__, e)
+    return ConversionResult(source, output, error, time.time() - start,
+                            dependencies, diagnostics.records(), fingerprints)
+
+
+def plan_tree(paths, outdir):
+    """Return (source, output) pairs for every CWL document found in paths."""
+    return [(source, os.path.join(outdir, wdl_filename(relpath)))
+            for source, relpath in find_cwl_files(paths)]
+
+
+def convert_jobs(work, jobs=1, cache=None, fingerprints=False):
+    """Convert (source, output) pairs, yielding a ConversionResult per pair
+    as conversions complete. With fingerprints, each result carries the
+    fingerprints of the files it was built from, see BuildState.record."""
+    work = [(source, output, cache, fingerprints) for source, output in work]
+
+    if jobs <= 1 or len(work) <= 1:
+        for job in work:
+            yield convert_to_file(job)
+        return
+
+    pool = multiprocessing.Pool(min(jobs, len(work)))
+    try:
+        for result in pool.imap_unordered(convert_to_file, work):
+            yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def convert_tree(paths, outdir, jobs=1, cache=None):
+    """Convert every CWL document found in paths into outdir.
+
+    Yields a ConversionResult per file as conversions complete.
+    """
+    return convert_jobs(plan_tree(paths, outdir), jobs, cache)
+
+
+def convert_changed(paths, outdir, state, jobs=1, cache=None):
+    """Convert only the documents in paths whose output is missing or whose
+    source or imported files changed since they were last converted.
+    Unchanged documents are not even parsed.
+
+    Yields a ConversionResult per converted file and updates state.
+    """
+    work = plan_tree(paths, outdir)
+    state.start_pass()
+
+    outputs = set(output for source, output in work)
+    for output in list(state.outputs):
+        if output not in outputs:
+            state.forget(output)
+
+    stale = [(source, output) for source, output in work
+             if state.is_stale(source, output)]
+    try:
+        for result in convert_jobs(stale, jobs, cache, fingerprints=True):
+            state.record(result.source, result.output, result.dependencies,
+                         failed=result.error is not None,
+                         fingerprints=result.fingerprints)
+            yield result
+    finally:
+        if state.modified:
+            state.save()
+
+
+def _report(results, quiet, start, diagnostics_file=None):
+    failed = 0
+    diagnostics = Diagnostics()
+    for result in results:
+        diagnostics.extend(result.diagnostics)
+        if result.error is not None:
+            failed += 1
+            print("FAIL %s: %s" % (result.source, result.error),
+                  file=sys.stderr)
+        elif not quiet:
+            print("OK   %s -> %s (%.3fs)" % (result.source, result.output,
+                                              result.seconds),
+                  file=sys.stderr)
+
+    print("Converted %d of %d files in %.2fs, %d failed." %
+          (len(results) - failed, len(results), time.time() - start, failed),
+          file=sys.stderr)
+    # a tally only, thousands of files would flood stderr otherwise
+    if len(diagnostics):
+        print("%d warnings: %s" % (diagnostics.total(), ", ".join(
+            "%s %d" % item for item in sorted(diagnostics.by_code().items()))),
+            file=sys.stderr)
+    if diagnostics_file is not None:
+        diagnostics.write(diagnostics_file)
+    return failed
+
+
+def cli(argv=None):
+    parser = collect_args()
+    arguments = parser.parse_args(argv)
+
+    if arguments.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    cache = cache_from_args(arguments)
+
+    if not (arguments.incremental or arguments.watch):
+        start = time.time()
+        results = list(convert_tree(arguments.PATH, arguments.outdir,
+                                    arguments.jobs, cache))
+        if _report(results, arguments.quiet, start, arguments.diagnostics):
+            sys.exit(1)
+        return
+
+    state = BuildState(os.path.join(arguments.outdir, STATE_FILENAME))
+    while True:
+        start = time.time()
+        results = list(convert_changed(arguments.PATH, arguments.outdir, state,
+                                       arguments.jobs, cache))
+        if results or not arguments.watch:
+            failed = _report(results, arguments.quiet, start,
+                             arguments.diagnostics)
+        if not arguments.watch:
+            if failed:
+                sys.exit(1)
+            return
+        try:
+            time.sleep(arguments.interval)
+        except KeyboardInterrupt:
+            return
@@ -0,0 +1,254 @@
+"""
+Persistent, content-addressed cache of parsed CWL documents
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import glob
+import hashlib
+import os
+
+import cwl2wdl
+from cwl2wdl import tracing
+from cwl2wdl.loaders import reject_stream
+from cwl2wdl.parsers import CwlParser
+from cwl2wdl.resolvers import FileResolver
+
+
+# bump when the layout of a cache entry changes
+CACHE_FORMAT = 2
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+ENTRY_EXTENSION = ".pickle.z"
+
+# bytes hashed at a time
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+def default_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME",
+                                os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "cwl2wdl")
+
+
+def file_digest(filename):
+    """sha256 of the content of filename, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as handle:
+        for chunk in iter(lambda: handle.read(DIGEST_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(filename):
+    """[mtime, size, sha256] of filename. The file is stat'ed before it is
+    hashed, so an edit made while hashing shows up as a changed mtime."""
+    stat = os.stat(filename)
+    return [stat.st_mtime, stat.st_size, file_digest(filename)]
+
+
+_converter_signature = None
+
+
+def converter_signature():
+    """Identifies the converter code that produced a cache entry.
+
+    The package version alone is 'undefined' outside of a release, so the
+    source of the package modules is hashed as well.
+    """
+    global _converter_signature
+    if _converter_signature is None:
+        digest = hashlib.sha256()
+        digest.update(("%s:%s" % (CACHE_FORMAT, cwl2wdl.__version__)).encode("utf-8"))
+        package_dir = os.path.dirname(os.path.abspath(cwl2wdl.__file__))
+        for module in sorted(glob.glob(os.path.join(package_dir, "*.py"))):
+            with open(module, "rb") as handle:
+                digest.update(handle.read())
+        _converter_signature = digest.hexdigest()
+    return _converter_signature
+
+
+class DocumentCache(object):
+    """Stores the dict returned by CwlParser.parse_document on disk.
+
+    Entries are keyed by the converter signature, the location and the
+    content hash of the source file. Each entry also records the content
+    hash of every file imported while parsing, and is only used when all of
+    them are unchanged. The diagnostics of the parse are stored as well, and
+    replayed on a hit. Entries are pickled and zlib compressed. Once the
+    total size exceeds max_size the least recently used entries are evicted.
+    """
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__size = None
+
+    def __getstate__(self):
+        # only the configuration is shipped to worker processes
+        return {"cache_dir": self.cache_dir, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_dir"], state["max_size"])
+
+    def parse_document(self, filename, diagnostics=None):
+        """Return the parsed document for filename, parsing it on a miss."""
+        return self.parse(filename, diagnostics)[0]
+
+    def parse(self, filename, diagnostics=None, fingerprints=None):
+        """Return the parsed document for filename and the absolute paths of
+        the files it was built from, parsing it on a miss. Issues found while
+        parsing are added to diagnostics. If fingerprints is a dict, the
+        fingerprint() of every one of those files, taken before it was read
+        or checked, is stored in it by path."""
+        source = os.path.abspath(filename)
+        checked = {source: fingerprint(source)}
+        entry_file = self.__entry_file(source, checked[source][2])
+
+        entry = self.__load(entry_file)
+        if entry is not None and self.__is_current(entry, source, checked):
+            self.hits += 1
+            tracing.count("document cache hits")
+            if diagnostics is not None:
+                diagnostics.extend(entry["diagnostics"])
+            if fingerprints is not None:
+                fingerprints.update(checked)
+            return entry["document"], [d[0] for d in entry["dependencies"]]
+
+        # only checked on a miss, a stream is never stored
+        reject_stream(filename)
+        self.misses += 1
+        tracing.count("document cache misses")
+        # the entry records the content that was parsed, the source is
+        # already fingerprinted
+        read = {source: checked[source]}
+        parser = CwlParser(filename, resolver=FileResolver(fingerprints=read))
+        document = parser.parse_document()
+        records = parser.diagnostics.records()
+        self.__store(entry_file, parser.dependencies, read, document, records)
+        if diagnostics is not None:
+            diagnostics.extend(records)
+        if fingerprints is not None:
+            fingerprints.update(read)
+        return document, parser.dependencies
+
+    def clear(self):
+        for entry_file in self.__entries():
+            self.__remove(entry_file)
+        self.__size = 0
+
+    ############################
+    # Helper functions
+    ############################
+    def __entry_file(self, source, digest):
+        key = hashlib.sha256(
+            "\0".join([converter_signature(), source, digest]).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, key + ENTRY_EXTENSION)
+
+    def __entries(self):
+        return glob.glob(os.path.join(self.cache_dir, "*" + ENTRY_EXTENSION))
+
+    def __is_current(self, entry, source, checked):
+        for dependency, digest in entry["dependencies"]:
+            if dependency == source:
+                continue
+            try:
+                checked[dependency] = fingerprint(dependency)
+            except (IOError, OSError):
+                return False
+            if checked[dependency][2] != digest:
+                return False
+        return True
+
+    def __load(self, entry_file):
+        # imported on first use, the command line only needs the defaults
+        # of this module
+        import pickle
+        import zlib
+        try:
+            with open(entry_file, "rb") as handle:
+                entry = pickle.loads(zlib.decompress(handle.read()))
+        except (IOError, OSError):
+            return None
+        except Exception:
+            # truncated or otherwise unreadable entry
+            self.__remove(entry_file)
+            return None
+
+        # bump the mtime, which orders entries for eviction
+        try:
+            os.utime(entry_file, None)
+        except OSError:
+            pass
+        return entry
+
+    def __store(self, entry_file, dependencies, read, document, diagnostics):
+        import pickle
+        import tempfile
+        import zlib
+        try:
+            # files reused from the session without being read again are
+            # hashed now
+            entry = {"dependencies": [(d, read[d][2] if d in read else file_digest(d))
+                                      for d in dependencies],
+                     "document": document,
+                     "diagnostics": [tuple(r) for r in diagnostics]}
+            data = zlib.compress(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            handle, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(handle, "wb") as out:
+                out.write(data)
+            os.rename(tmp_file, entry_file)
+        except (IOError, OSError):
+            # the cache is an optimization, never a reason to fail
+            return
+
+        if self.__size is not None:
+            self.__size += len(data)
+        if self.__size is None or self.__size > self.max_size:
+            self.__evict()
+
+    def __evict(self):
+        self.__size = evict_least_recent(self.__entries(), self.max_size)
+
+    def __remove(self, entry_file):
+        try:
+            os.remove(entry_file)
+        except OSError:
+            pass
+
+
+def evict_least_recent(entry_files, max_size):
+    """Remove the least recently used (oldest mtime) of entry_files once
+    they take more than max_size bytes. Returns the size left."""
+    entries = []
+    for entry_file in entry_files:
+        try:
+            stat = os.stat(entry_file)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry_file))
+
+    total = sum(e[1] for e in entries)
+    if total <= max_size:
+        return total
+
+    # evict down to 90% of the cap so the directory isn't rescanned on
+    # every store
+    low_water = max_size * 0.9
+    for mtime, size, entry_file in sorted(entries):
+        if total <= low_water:
+            break
+        try:
+            os.remove(entry_file)
+        except OSError:
+            continue
+        total -= size
+    return total
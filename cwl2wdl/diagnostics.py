@@ -0,0 +1,76 @@
+"""
+Structured, deduplicated diagnostics collected during conversions
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import json
+
+
+Diagnostic = collections.namedtuple(
+    "Diagnostic", ["code", "message", "location", "count"]
+)
+
+
+class Diagnostics(object):
+    """Issues found while converting, e.g. unsupported requirements.
+
+    Each issue is identified by a short code, a message and the location
+    (usually the CWL file) it was found in. Identical issues are recorded
+    once with a count, so adding one costs a dict lookup.
+    """
+    def __init__(self):
+        # (code, message, location) -> count, in the order first seen
+        self.__counts = collections.OrderedDict()
+
+    def add(self, code, message, location=None, count=1):
+        key = (code, message, location)
+        self.__counts[key] = self.__counts.get(key, 0) + count
+
+    def extend(self, records):
+        """Add Diagnostic records, e.g. those of another collector or those
+        stored along with a cached document."""
+        for code, message, location, count in records:
+            self.add(code, message, location, count)
+
+    def records(self):
+        """Diagnostic tuples, in the order they were first seen."""
+        return [Diagnostic(code, message, location, count)
+                for (code, message, location), count in self.__counts.items()]
+
+    def __len__(self):
+        return len(self.__counts)
+
+    def total(self):
+        return sum(self.__counts.values())
+
+    def by_code(self):
+        counts = {}
+        for (code, message, location), count in self.__counts.items():
+            counts[code] = counts.get(code, 0) + count
+        return counts
+
+    def summary(self):
+        """One line per distinct issue, grouped by code."""
+        lines = []
+        for record in sorted(self.records(), key=lambda r: (r.code, r.location or "")):
+            line = "warning [%s] %s" % (record.code, record.message)
+            if record.location is not None:
+                line += " (%s)" % (record.location)
+            if record.count > 1:
+                line += " x%d" % (record.count)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def report(self):
+        """The diagnostics as a JSON-serializable dict."""
+        return {"total": self.total(),
+                "by_code": self.by_code(),
+                "diagnostics": [r._asdict() for r in self.records()]}
+
+    def write(self, filename):
+        with open(filename, "w") as out:
+            out.write(json.dumps(self.report(), indent=1, sort_keys=True))
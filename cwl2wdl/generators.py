@@ -5,28 +5,64 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import heapq
+import io
 import re
 
+from cwl2wdl import tracing, wdl_model
+
+
+# subworkflows nested deeper than this are rejected rather than risking
+# the interpreter's recursion limit further down the line
+MAX_SUBWORKFLOW_DEPTH = 100
+
+
+class GenerationError(Exception):
+    pass
+
+
+def order_steps(steps):
+    """Order workflow steps so each step follows the steps its inputs are
+    sourced from. Independent steps keep their document order, so the
+    result is deterministic; steps caught in a cycle are appended in
+    document order."""
+    index = {}
+    for i, step in enumerate(steps):
+        index.setdefault(step.step_id, i)
+
+    upstream_count = []
+    downstream = [[] for _ in steps]
+    for i, step in enumerate(steps):
+        upstream = set()
+        for step_input in step.inputs:
+            for source in step_input.source:
+                # 'step.output' (draft-3) or 'step/output'
+                j = index.get(re.split("[./]", source)[0])
+                if j is not None and j != i:
+                    upstream.add(j)
+        upstream_count.append(len(upstream))
+        for j in upstream:
+            downstream[j].append(i)
+
+    ready = [i for i, count in enumerate(upstream_count) if count == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for j in downstream[i]:
+            upstream_count[j] -= 1
+            if upstream_count[j] == 0:
+                heapq.heappush(ready, j)
+
+    if len(order) < len(steps):
+        placed = set(order)
+        order += [i for i in range(len(steps)) if i not in placed]
+    return [steps[i] for i in order]
+
 
 class WdlTaskGenerator(object):
     def __init__(self, task):
-        self.template = """
-task %s {
-    %s
-
-    command {
-        %s
-    }
-
-    output {
-        %s
-    }
-
-    runtime {
-        %s
-    }
-}
-"""
         self.name = task.name
         self.inputs = task.inputs
         self.command = task.command
@@ -35,20 +71,18 @@ task %s {
         self.stdin = task.stdin
         self.stdout = task.stdout
 
-    def __format_inputs(self):
+    def __build_inputs(self):
         inputs = []
-        template = "%s %s"
         for var in self.inputs:
             if var.is_required:
                 variable_type = var.variable_type
             else:
-                variable_type = re.sub("($)", "?", var.variable_type)
+                variable_type = var.variable_type + "?"
 
-            inputs.append(template % (variable_type,
-                                      var.name))
-        return "\n    ".join(inputs)
+            inputs.append(wdl_model.Declaration(variable_type, var.name))
+        return inputs
 
-    def __format_command(self):
+    def __build_command(self):
         command_position = [0]
         command_parts = [self.command.baseCommand]
 
@@ -132,131 +166,166 @@ task %s {
         if self.stdout is not None:
             ordered_command_parts.append("> ${%s}" % (self.stdout))
 
-        return " \\\n        ".join(ordered_command_parts)
+        return wdl_model.Command(ordered_command_parts)
 
-    def __format_outputs(self):
+    def __build_outputs(self):
         outputs = []
-        template = "%s %s = %s"
         for var in self.outputs:
-            outputs.append(template % (var.variable_type,
-                                       var.name,
-                                       var.output))
-        return "\n        ".join(outputs)
-
-    def __format_runtime(self):
-        template = "%s: \'%s\'"
-        requirements = []
+            outputs.append(wdl_model.Declaration(var.variable_type,
+                                                 var.name,
+                                                 var.output))
+        return outputs
+
+    def __build_runtime(self):
+        attributes = []
         for requirement in self.requirements:
             if (requirement.requirement_type is None) or (requirement.value is None) or (requirement.requirement_type == "envVar"):
                 continue
             else:
-                requirements.append(template % (requirement.requirement_type,
-                                                requirement.value))
-        return "\n        ".join(requirements)
+                attributes.append((requirement.requirement_type,
+                                   requirement.value))
+        return wdl_model.Runtime(attributes)
 
-    def generate_wdl(self):
-        wdl = self.template % (self.name, self.__format_inputs(),
-                               self.__format_command(), self.__format_outputs(),
-                               self.__format_runtime())
+    def build(self):
+        """Return the wdl_model.Task describing this task."""
+        return wdl_model.Task(self.name, self.__build_inputs(),
+                              self.__build_command(), self.__build_outputs(),
+                              self.__build_runtime())
 
-        # if no relavant runtime variables are specified remove that
-        # section from the template
-        if self.__format_runtime() == '':
-            no_runtime = "\s+runtime {\s+}"
-            wdl = re.sub(no_runtime, "", wdl)
+    def generate_wdl(self, out=None):
+        """Render the task. Returns the text, or writes it to the file-like
+        object out if one is given."""
+        if out is None:
+            buf = io.StringIO()
+            self.generate_wdl(buf)
+            return buf.getvalue()
 
-        return wdl
+        with tracing.span("generate task %s" % (self.name), "generate"):
+            wdl_model.WdlPrinter(out).write(self.build())
+        tracing.count("tasks generated")
 
 
 class WdlWorkflowGenerator(object):
-    def __init__(self, workflow):
-        self.template = """
-workflow %s {
-    %s
-    %s
-    %s
-}
-%s
-"""
+    def __init__(self, workflow, emitted=None, namespaces=None):
         self.name = workflow.name
         self.inputs = workflow.inputs
         self.outputs = workflow.outputs
         self.steps = workflow.steps
         self.subworkflows = workflow.subworkflows
+        self.ordered_steps = order_steps(self.steps + self.subworkflows)
         self.task_ids = []
-        self.imported_tasks = []
-
-    def __format_inputs(self):
+        # ids of the task and workflow definitions already written during
+        # this conversion, shared with the generators of subworkflows
+        self.emitted = emitted if emitted is not None else set()
+        # id() of a called definition -> the namespace it is imported as,
+        # for workflows calling definitions in other files
+        self.namespaces = namespaces if namespaces is not None else {}
+
+    def __build_inputs(self):
         inputs = []
-        template = "{0} {1}"
         for var in self.inputs:
             if var.is_required:
                 variable_type = var.variable_type
             else:
-                variable_type = re.sub("($)", "?", var.variable_type)
+                variable_type = var.variable_type + "?"
 
-            inputs.append(template.format(variable_type,
-                                          var.name))
-        return "\n    ".join(inputs)
+            inputs.append(wdl_model.Declaration(variable_type, var.name))
+        return inputs
 
-    def __format_outputs(self):
+    def __build_outputs(self):
         if len(self.outputs) > 0:
-            template = """
-   output {
-     %s
-"""
-            outputs = []
-            for outp in self.outputs:
-                outputs.append(outp.name)
-            return template % "\n     ".join(outputs)
+            return wdl_model.WorkflowOutputs([outp.name for outp in self.outputs])
+        return None
 
-    def __format_steps(self):
+    def __build_steps(self):
         steps = []
-        for step in self.steps + self.subworkflows:
+        for step in self.ordered_steps:
             self.task_ids.append(step.task_id)
 
-            if step.task_definition is not None:
-                task_gen = (WdlTaskGenerator(step.task_definition) if step.step_type == "task"
-                            else WdlWorkflowGenerator(step.task_definition))
-                self.imported_tasks.append(task_gen.generate_wdl())
+            prefixes = (step.step_id + ".", step.task_id + ".")
+            inputs = [(_strip_prefix(inp.input_id, prefixes), inp.value)
+                      for inp in step.inputs]
+
+            # a call is named after the definition it calls, which can
+            # differ from the file it was imported from
+            definition = step.task_definition
+            call_name = definition.name if definition is not None else step.task_id
+            task_name = call_name
+            namespace = self.namespaces.get(id(definition))
+            if namespace is not None:
+                task_name = "%s.%s" % (namespace, call_name)
+
+            # the inputs of later calls refer to the outputs of this one by
+            # step id, as does order_steps
+            if step.step_id != call_name:
+                call = wdl_model.Call(task_name, inputs, alias=step.step_id)
+            else:
+                call = wdl_model.Call(task_name, inputs)
 
-            if step.inputs != []:
-                step_template = """
-    call %s {
-        input: %s
-    }
-"""
-                inputs = []
-                for i, inp in enumerate(step.inputs):
-                    pad = "          " if i > 0 else ""
-                    inputs.append(
-                        "%s%s=%s" % (pad, re.sub(step.task_id + "\.", "", inp.input_id),
-                                     inp.value)
-                    )
-                steps.append(self._format_scatter(step.scatter,
-                                                  step_template % (step.task_id, ", \n".join(inputs))))
+            if step.scatter:
+                steps.append(wdl_model.Scatter(step.scatter, [call]))
             else:
-                step_template = "call %s"
-                steps.append(self._format_scatter(step.scatter, step_template % (step.task_id)))
-        return "\n".join(steps)
-
-    def _format_scatter(self, scatter, body):
-        """Add scatter information to a workflow step.
-        """
-        if scatter:
-            parts = ["  " + l for l in body.split("\n")]
-            scatter_parts = ["%s in %s" % (x, y) for x, y in scatter]
-            template = """
-    scatter (%s) {
-%s
-    }
-"""
-            body = template % ("\n             ".join(scatter_parts), "\n".join(parts))
-        return body
+                steps.append(call)
+        return steps
+
+    def build(self):
+        """Return the wdl_model.Workflow describing this workflow, without
+        the definitions of the tasks it calls."""
+        return wdl_model.Workflow(self.name, self.__build_inputs(),
+                                  self.__build_steps(), self.__build_outputs())
+
+    def generate_wdl(self, out=None):
+        """Render the workflow followed by the tasks it calls. Returns the
+        text, or writes each section to the file-like object out as soon as
+        it is produced if one is given."""
+        if out is None:
+            buf = io.StringIO()
+            self.generate_wdl(buf)
+            return buf.getvalue()
+
+        # the called definitions are rendered one after another, depth
+        # first, so only a single task is held in memory at a time. Each
+        # definition is rendered once per conversion, however many steps
+        # and subworkflows call it, and nested subworkflows are tracked on
+        # an explicit stack instead of recursing.
+        self.__write(out, 0)
+        stack = [(self, iter(self.ordered_steps))]
+        max_depth = 0
+        while stack:
+            generator, steps = stack[-1]
+            step = next(steps, None)
+            if step is None:
+                stack.pop()
+                continue
 
-    def generate_wdl(self):
-        wdl = self.template % (self.name, self.__format_inputs(), self.__format_steps(),
-                               self.__format_outputs(),
-                               "\n".join(self.imported_tasks))
+            definition = step.task_definition
+            if definition is None or id(definition) in self.emitted:
+                continue
+            self.emitted.add(id(definition))
+            if step.step_type == "task":
+                WdlTaskGenerator(definition).generate_wdl(out)
+                continue
 
-        return wdl
+            if len(stack) > MAX_SUBWORKFLOW_DEPTH:
+                raise GenerationError(
+                    "Subworkflows are nested more than %d levels deep: %s" %
+                    (MAX_SUBWORKFLOW_DEPTH,
+                     " -> ".join([g.name for g, _ in stack] + [definition.name])))
+            nested = WdlWorkflowGenerator(definition, self.emitted)
+            nested.__write(out, len(stack))
+            max_depth = max(max_depth, len(stack))
+            stack.append((nested, iter(nested.ordered_steps)))
+        tracing.peak("subworkflow depth", max_depth)
+
+    def __write(self, out, depth):
+        with tracing.span("generate workflow %s" % (self.name), "generate",
+                          depth=depth):
+            wdl_model.WdlPrinter(out).write(self.build())
+        tracing.count("workflows generated")
+
+
+def _strip_prefix(input_id, prefixes):
+    for prefix in prefixes:
+        if input_id.startswith(prefix):
+            return input_id[len(prefix):]
+    return input_id
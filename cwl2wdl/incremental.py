@@ -0,0 +1,133 @@
+"""
+Incremental re-conversion of CWL trees, driven by a persisted dependency graph
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import tempfile
+
+from cwl2wdl.cache import converter_signature, file_digest, fingerprint
+
+
+STATE_FILENAME = ".cwl2wdl-state.json"
+
+# bump when the layout of the state file changes
+STATE_FORMAT = 1
+
+
+class BuildState(object):
+    """Maps every output .wdl to the CWL files it was built from.
+
+    The state is stored as JSON next to the outputs. Each output records the
+    fingerprint of its source document and of every step and requirement
+    file it imports. A file counts as changed when its mtime or size differs
+    and its content hash does too, so touching a file doesn't force a
+    re-conversion, and an unchanged tree is checked with stat calls only.
+    """
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.outputs = {}
+        # whether outputs differs from the stored state
+        self.modified = False
+        self.__changed = {}
+
+        try:
+            with io.open(state_file, encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (IOError, OSError, ValueError):
+            return
+
+        if state.get("format") == STATE_FORMAT and \
+           state.get("converter") == converter_signature():
+            self.outputs = state["outputs"]
+
+    def save(self):
+        state = {"format": STATE_FORMAT,
+                 "converter": converter_signature(),
+                 "outputs": self.outputs}
+        state_dir = os.path.dirname(os.path.abspath(self.state_file))
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+        handle, tmp_file = tempfile.mkstemp(dir=state_dir, suffix=".tmp")
+        with io.open(handle, "w", encoding="utf-8") as out:
+            out.write(json.dumps(state, indent=1, sort_keys=True))
+        os.rename(tmp_file, self.state_file)
+        self.modified = False
+
+    def is_stale(self, source, output):
+        """Whether output has to be (re)built from source."""
+        record = self.outputs.get(output)
+        if record is None or record["source"] != os.path.abspath(source):
+            return True
+        if not record.get("failed") and not os.path.exists(output):
+            return True
+        return any(self.__has_changed(path, recorded)
+                   for path, recorded in record["dependencies"].items())
+
+    def record(self, source, output, dependencies, failed=False,
+               fingerprints=None):
+        """Store the fingerprints of the files output was built from. Failed
+        conversions are recorded too, so they are only retried once one of
+        their files changes.
+
+        fingerprints holds those taken by the conversion before it read each
+        file, so that an edit saved during the conversion is seen next time.
+        Files missing from it are fingerprinted now.
+        """
+        recorded = {}
+        for path in dependencies:
+            if fingerprints is not None and path in fingerprints:
+                recorded[path] = list(fingerprints[path])
+                continue
+            try:
+                recorded[path] = fingerprint(path)
+            except (IOError, OSError):
+                # vanished since the conversion, check again next time
+                recorded[path] = [None, None, None]
+        self.outputs[output] = {"source": os.path.abspath(source),
+                                "failed": failed,
+                                "dependencies": recorded}
+        self.modified = True
+
+    def forget(self, output):
+        if self.outputs.pop(output, None) is not None:
+            self.modified = True
+
+    def start_pass(self):
+        """Forget which files were seen to change, e.g. between two polls of
+        a watch loop."""
+        self.__changed = {}
+
+    def __has_changed(self, path, recorded):
+        # dependencies are shared by many outputs, so each file is only
+        # checked once per pass against each fingerprint it was recorded
+        # with; outputs rebuilt during the pass hold a newer one
+        key = (path, tuple(recorded))
+        if key not in self.__changed:
+            self.__changed[key] = self.__compare(path, recorded)
+        return self.__changed[key]
+
+    def __compare(self, path, recorded):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        mtime, size, digest = recorded
+        if stat.st_mtime == mtime and stat.st_size == size:
+            return False
+        if stat.st_size != size:
+            return True
+        try:
+            if file_digest(path) != digest:
+                return True
+        except (IOError, OSError):
+            return True
+        # touched but unchanged, remember the new mtime
+        recorded[0] = stat.st_mtime
+        self.modified = True
+        return False
@@ -0,0 +1,329 @@
+"""
+Conversion of CWL job files to Cromwell inputs JSON
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import types
+
+import argparse
+
+try:
+    from urllib.parse import unquote
+except ImportError:
+    from urllib import unquote
+
+from cwl2wdl import tracing
+from cwl2wdl.diagnostics import Diagnostics
+from cwl2wdl.loaders import load_file
+
+
+# characters read from a JSON job file at a time
+CHUNK_SIZE = 64 * 1024
+
+NUMBER_START = "-0123456789"
+NUMBER_CHARACTERS = "0123456789+-.eE"
+
+
+class JsonStream(object):
+    """Incremental reader of a JSON text from a file-like object.
+
+    Values are decoded one at a time with json's raw_decode, from a buffer
+    that only holds the text of the value being decoded, so the elements of
+    a huge array can be read one by one.
+    """
+    def __init__(self, handle, chunk_size=CHUNK_SIZE):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        # characters dropped from the front of the buffer so far
+        self.consumed = 0
+        self.decoder = json.JSONDecoder()
+
+    def peek(self):
+        """The next character other than whitespace, "" at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.__fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, characters):
+        """Consume the next character, which must be one of characters."""
+        char = self.peek()
+        if not char or char not in characters:
+            raise ValueError("Expected %s at character %d of the job file, got %r" %
+                             (" or ".join(characters), self.consumed + self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete value."""
+        char = self.peek()
+        if char and char in NUMBER_START:
+            # a number may go on in the next chunk, read up to its end
+            end = self.pos
+            while True:
+                while end < len(self.buffer) and self.buffer[end] in NUMBER_CHARACTERS:
+                    end += 1
+                if end < len(self.buffer):
+                    break
+                end -= self.pos
+                if not self.__fill():
+                    break
+                end += self.pos
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # the value continues in the next chunk
+                if not self.__fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+    def elements(self):
+        """Yield the elements of the array starting here, one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+    def __fill(self):
+        chunk = self.handle.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+
+def read_json_job(filename):
+    """Yield the (name, value) pairs of a JSON job file.
+
+    The values are read one at a time and the elements of arrays are yielded
+    lazily, as a generator that has to be consumed before the next pair is
+    read. A ValueError is raised as soon as the file turns out not to be
+    JSON, e.g. a YAML job or a YAML flow mapping that only looks like JSON,
+    possibly while an array is being consumed.
+    """
+    with io.open(filename, encoding="utf-8") as handle:
+        for pair in _read_json_job(JsonStream(handle)):
+            yield pair
+
+
+def load_job(filename):
+    """Load a CWL job file of any kind whole, as a dict."""
+    job = load_file(filename)
+    if not isinstance(job, dict):
+        raise ValueError("%s is not a CWL job, a mapping of input names to values." %
+                         (filename))
+    return job
+
+
+def _read_json_job(stream):
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        name = stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            yield name, stream.elements()
+        else:
+            yield name, stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+
+def wdl_value(value, base_dir=None):
+    """The Cromwell input value of a CWL job value: File and Directory
+    objects become their path, resolved against base_dir (the directory of
+    the job file) as CWL does, arrays and records are converted
+    recursively."""
+    if isinstance(value, dict):
+        if value.get("class") in ("File", "Directory"):
+            return local_path(value.get("path", value.get("location")), base_dir)
+        return dict((k, wdl_value(v, base_dir)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [wdl_value(v, base_dir) for v in value]
+    return value
+
+
+def local_path(reference, base_dir=None):
+    """The path of a File or Directory 'path' or 'location': file:// URIs
+    become paths, relative paths are made absolute against base_dir, and
+    other URIs (gs://, http://) are left for Cromwell to localize."""
+    if reference is None:
+        return None
+    if reference.startswith("file://"):
+        return unquote(reference[len("file://"):])
+    if re.match("[A-Za-z][A-Za-z0-9+.-]*://", reference):
+        return reference
+    if base_dir is not None:
+        return os.path.normpath(os.path.join(base_dir, reference))
+    return reference
+
+
+def write_inputs(parsed_cwl, job_file, out, diagnostics=None):
+    """Write the Cromwell inputs JSON of the CWL job in job_file, for the
+    conversion parsed_cwl, to the file-like object out.
+
+    Keys are the inputs of the top-level workflow, or of the only task of a
+    tool, qualified by its name. Relative paths of files are resolved
+    against the directory of the job file. The arrays of JSON jobs are
+    converted and written element by element, to a temporary file first:
+    if the job turns out not to be JSON part way through, it is loaded
+    whole as YAML and converted again, and nothing of the first attempt
+    reaches out. Job entries that aren't inputs, and required inputs
+    missing from the job, are reported to diagnostics.
+    """
+    if diagnostics is None:
+        diagnostics = Diagnostics()
+    if parsed_cwl.workflow is not None:
+        target = parsed_cwl.workflow
+    elif parsed_cwl.tasks and len(parsed_cwl.tasks) == 1:
+        target = parsed_cwl.tasks[0]
+    else:
+        raise ValueError("Job files can only be converted for a workflow or "
+                         "a single tool.")
+
+    inputs = {}
+    for declaration in target.inputs:
+        inputs[declaration.name] = declaration
+        if declaration.name.endswith("_variable"):
+            # renamed as it was a WDL keyword
+            inputs.setdefault(declaration.name[:-len("_variable")], declaration)
+
+    base_dir = os.path.dirname(os.path.abspath(job_file))
+    found = Diagnostics()
+    with tracing.span("convert job %s" % (job_file), "job"):
+        handle, spool_file = tempfile.mkstemp(suffix=".json")
+        try:
+            with io.open(handle, "w+", encoding="utf-8") as spool:
+                try:
+                    provided = _write_job(read_json_job(job_file), target, inputs,
+                                          base_dir, spool, found, job_file)
+                except ValueError:
+                    # not JSON after all, as in loaders.load_text
+                    provided = None
+                else:
+                    spool.seek(0)
+                    shutil.copyfileobj(spool, out)
+        finally:
+            os.remove(spool_file)
+
+        if provided is None:
+            found = Diagnostics()
+            provided = _write_job(load_job(job_file).items(), target, inputs,
+                                  base_dir, out, found, job_file)
+    diagnostics.extend(found.records())
+
+    for declaration in target.inputs:
+        if (declaration.is_required and declaration.default is None and
+                declaration.name not in provided):
+            diagnostics.add("missing-job-input",
+                            "Required input %s of %s is not in the job." %
+                            (declaration.name, target.name), job_file)
+
+
+############################
+# Helper functions
+############################
+def _write_job(pairs, target, inputs, base_dir, out, diagnostics, job_file):
+    """Write the (name, value) pairs of a job as the inputs JSON of target
+    and return the names of the inputs provided."""
+    provided = set()
+    separator = "{"
+    for name, value in pairs:
+        declaration = inputs.get(name)
+        if declaration is None:
+            diagnostics.add("unknown-job-input",
+                            "%s is not an input of %s." % (name, target.name),
+                            job_file)
+            if isinstance(value, types.GeneratorType):
+                for _ in value:
+                    pass
+            continue
+
+        provided.add(declaration.name)
+        out.write("%s\n    %s: " % (separator, json.dumps("%s.%s" % (target.name,
+                                                                    declaration.name))))
+        separator = ","
+        if isinstance(value, types.GeneratorType):
+            count = 0
+            out.write("[")
+            for element in value:
+                out.write((", " if count else "") +
+                          json.dumps(wdl_value(element, base_dir)))
+                count += 1
+            out.write("]")
+            tracing.count("job array elements", count)
+        else:
+            out.write(json.dumps(wdl_value(value, base_dir)))
+    out.write("%s\n}\n" % ("{" if separator == "{" else ""))
+    return provided
+
+
+def collect_args():
+    from cwl2wdl.main import add_cache_args
+    parser = argparse.ArgumentParser(
+        prog="cwl2wdl inputs",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser._optionals.title = "Options"
+    parser.add_argument("FILE", type=str, help="CWL file.")
+    parser.add_argument("JOB", type=str, help="CWL job file, JSON or YAML.")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="write the inputs JSON to this file instead of stdout")
+    add_cache_args(parser)
+    return parser
+
+
+def cli(argv=None):
+    from cwl2wdl.main import cache_from_args, parse_file
+    arguments = collect_args().parse_args(argv)
+    diagnostics = Diagnostics()
+    parsed_cwl = parse_file(arguments.FILE, cache_from_args(arguments), diagnostics)
+
+    tmp_file = None
+    if arguments.output is not None:
+        # written beside the output and renamed into place once complete, so
+        # a failure never leaves a truncated file behind
+        handle, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(arguments.output)), suffix=".tmp"
+        )
+        out = io.open(handle, "w", encoding="utf-8")
+    else:
+        out = sys.stdout
+    try:
+        write_inputs(parsed_cwl, arguments.JOB, out, diagnostics)
+        if tmp_file is not None:
+            out.close()
+            os.rename(tmp_file, arguments.output)
+            tmp_file = None
+    finally:
+        if tmp_file is not None:
+            out.close()
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+        if len(diagnostics):
+            print(diagnostics.summary(), file=sys.stderr)
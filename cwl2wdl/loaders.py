@@ -0,0 +1,132 @@
+"""
+Loaders for YAML and JSON encoded CWL documents
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+from cwl2wdl import tracing
+
+
+# PyYAML is imported on the first YAML document, JSON documents never need it
+_safe_loader = None
+
+# bytes read to tell a JSON document from a YAML one
+_SNIFF_SIZE = 4096
+
+
+class MultipleDocumentsError(ValueError):
+    """The file is a stream of several YAML documents, see load_stream()."""
+    pass
+
+
+def safe_loader():
+    """The fastest safe YAML loader available: the libyaml based CSafeLoader,
+    an optional part of PyYAML, or the pure Python SafeLoader."""
+    global _safe_loader
+    if _safe_loader is None:
+        try:
+            from yaml import CSafeLoader as loader
+        except ImportError:
+            from yaml import SafeLoader as loader
+        _safe_loader = loader
+    return _safe_loader
+
+
+def has_libyaml():
+    return safe_loader().__name__ == "CSafeLoader"
+
+
+def load_text(text):
+    """Load a YAML or JSON document from a string.
+
+    Machine generated CWL is often plain JSON, which json can decode much
+    faster than any YAML loader. Anything json rejects is loaded as YAML.
+    """
+    if text.lstrip()[:1] in ("{", "["):
+        try:
+            return json.loads(text)
+        except ValueError:
+            # a YAML flow collection rather than JSON
+            pass
+    return _load_yaml(text)
+
+
+def load_file(filename):
+    """Load a YAML or JSON document from a file.
+
+    YAML is parsed straight from the file, so a multi-document stream is
+    given up on as soon as its second document starts, with a
+    MultipleDocumentsError, rather than after reading all of it.
+    """
+    with tracing.span("load %s" % (os.path.basename(filename)), "load"):
+        with open(filename, "rb") as handle:
+            head = handle.read(_SNIFF_SIZE)
+            tracing.count("files read")
+            if head.lstrip()[:1] in (b"{", b"["):
+                data = head + handle.read()
+                tracing.count("bytes parsed", len(data))
+                return load_text(data.decode("utf-8"))
+
+            tracing.count("bytes parsed", os.fstat(handle.fileno()).st_size)
+            handle.seek(0)
+            return _load_yaml(io.TextIOWrapper(handle, encoding="utf-8"))
+
+
+def is_stream(filename):
+    """Whether filename is a multi-document YAML stream, told from its
+    '---' document markers without parsing it. The file is read a line at
+    a time, up to the start of the second document. JSON documents and
+    YAML documents starting with a flow collection are not checked, which
+    load_file still catches."""
+    with io.open(filename, encoding="utf-8") as handle:
+        content = False
+        for line in handle:
+            if line.startswith("---") and line[3:4] in ("", " ", "\t", "\r", "\n"):
+                if content:
+                    return True
+                # '--- value' starts the first document with content
+                rest = line[3:].strip()
+                content = bool(rest) and not rest.startswith("#")
+            elif not content:
+                stripped = line.strip()
+                if stripped[:1] in ("{", "["):
+                    return False
+                # directives and comments are not content
+                content = bool(stripped) and not stripped.startswith(("#", "%"))
+    return False
+
+
+def reject_stream(filename):
+    """Raise a MultipleDocumentsError if filename is a multi-document
+    stream, see is_stream()."""
+    if is_stream(filename):
+        raise MultipleDocumentsError("%s holds several YAML documents" % (filename))
+
+
+def load_stream(filename):
+    """Yield the documents of a multi-document ('---' separated) YAML file
+    one at a time. The file is read as the documents are parsed, so only
+    the document being yielded is held in memory."""
+    import yaml
+    with io.open(filename, encoding="utf-8") as handle:
+        for document in yaml.load_all(handle, Loader=safe_loader()):
+            if document is not None:
+                tracing.count("stream documents")
+                yield document
+
+
+def _load_yaml(stream):
+    import yaml
+    try:
+        return yaml.load(stream, Loader=safe_loader())
+    except yaml.composer.ComposerError as e:
+        if e.context == "expected a single document in the stream":
+            raise MultipleDocumentsError("%s holds several YAML documents" %
+                                         (getattr(stream, "name", "The text")))
+        raise
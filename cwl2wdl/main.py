@@ -6,26 +6,23 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
 import os
-import warnings
-
-import argparse
-import wdl.parser
+import sys
 
 import cwl2wdl
+from cwl2wdl.diagnostics import Diagnostics
 from cwl2wdl.generators import WdlTaskGenerator, WdlWorkflowGenerator
-from cwl2wdl.parsers import CwlParser
+from cwl2wdl.loaders import (MultipleDocumentsError, load_stream, reject_stream,
+                             load_text)
+from cwl2wdl.parsers import CwlParser, ImportRegistry
+from cwl2wdl.resolvers import FileResolver, MappingResolver
 from cwl2wdl.base_classes import ParsedDocument
 
 
-# Setup warning message format
-formatwarning_orig = warnings.formatwarning
-warnings.formatwarning = lambda message, category, filename, lineno, line=None:\
-                         formatwarning_orig(message, category, filename,
-                                            lineno, line='')
-
-
 def collect_args():
+    # only the command line needs argparse
+    import argparse
     parser = argparse.ArgumentParser(
         prog="cwl2wdl",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
@@ -35,51 +32,305 @@ def collect_args():
     parser.add_argument("-f", "--format", type=str, default="wdl",
                         choices=["wdl", "ast"],
                         help="specify the output format")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="write the output to this file instead of stdout")
+    parser.add_argument("--output-dir", type=str, default=None, metavar="DIR",
+                        help="write every task and workflow to its own file "
+                        "in DIR, linked by imports; files whose content is "
+                        "unchanged are not rewritten")
+    parser.add_argument("--zip", type=str, default=None, metavar="FILE",
+                        help="with --output-dir, also write the files the "
+                        "top-level workflow imports to a zip, as Cromwell "
+                        "takes them")
     parser.add_argument("--validate", action="store_true",
                         help="validate the resulting WDL code with PyWDL")
+    parser.add_argument("--validate-tasks", action="store_true",
+                        help="validate every task and workflow separately and "
+                        "report the result of each")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes for --validate-tasks")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time spent in each phase, file and "
+                        "task to stderr")
+    parser.add_argument("--trace", type=str, default=None, metavar="FILE",
+                        help="write a Chrome trace-event JSON file of the "
+                        "conversion")
+    parser.add_argument("--diagnostics", type=str, default=None, metavar="FILE",
+                        help="write the conversion warnings to this file as JSON")
+    add_cache_args(parser)
     parser.add_argument("--version", action='version',
                         version=str(cwl2wdl.__version__))
     return parser
 
 
-class ValidationError(Exception):
-    pass
+def add_cache_args(parser):
+    from cwl2wdl.cache import DEFAULT_MAX_SIZE, default_cache_dir
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the cache of parsed CWL documents")
+    parser.add_argument("--cache-dir", type=str, default=default_cache_dir(),
+                        help="directory of the parsed CWL document cache")
+    parser.add_argument("--cache-size", type=int,
+                        default=DEFAULT_MAX_SIZE // (1024 * 1024),
+                        help="size cap of the document cache in MB, and "
+                        "separately of the --validate-tasks results kept in it")
 
 
-def cli():
-    parser = collect_args()
-    arguments = parser.parse_args()
+def cache_from_args(arguments):
+    if arguments.no_cache:
+        return None
+    from cwl2wdl.cache import DocumentCache
+    return DocumentCache(arguments.cache_dir,
+                         arguments.cache_size * 1024 * 1024)
 
-    if os.path.exists(arguments.FILE):
-        pass
+
+def parse_file(filename, cache=None, diagnostics=None, resolver=None):
+    """Parse the CWL document at filename into a ParsedDocument.
+
+    If cache is a DocumentCache the parsed document is looked up there.
+    Unsupported constructs are reported to diagnostics, if given. Files are
+    read through resolver if given, e.g. a FileResolver confined to a root
+    directory; the cache isn't used then.
+    """
+    return parse_file_and_dependencies(filename, cache, diagnostics, resolver)[0]
+
+
+def parse_file_and_dependencies(filename, cache=None, diagnostics=None,
+                                resolver=None, fingerprints=None):
+    """Like parse_file, but also returns the absolute paths of every file
+    the document was built from. If fingerprints is a dict, the
+    [mtime, size, sha256] of those files, taken before they were read, are
+    stored in it (not with a resolver of its own). Raises
+    MultipleDocumentsError for a multi-document stream, see
+    write_wdl_stream."""
+    # cache entries don't record which files a resolver would refuse
+    if cache is not None and resolver is None:
+        parsed_doc, dependencies = cache.parse(filename, diagnostics, fingerprints)
     else:
-        raise IOError("%s does not exist." % (arguments.FILE))
+        if resolver is None:
+            resolver = FileResolver(fingerprints=fingerprints)
+        # told apart before it is parsed, a stream is only ever read a
+        # document at a time
+        reject_stream(filename)
+        parser = CwlParser(filename, diagnostics=diagnostics, resolver=resolver)
+        parsed_doc = parser.parse_document()
+        dependencies = parser.dependencies
+    return ParsedDocument(parsed_doc), dependencies
 
-    parsed_cwl = ParsedDocument(
-        CwlParser(arguments.FILE).parse_document()
-    )
 
-    wdl_parts = []
+def write_wdl(parsed_cwl, out):
+    """Write the WDL representation of parsed_cwl to the file-like object
+    out, one task or workflow at a time."""
+    # each definition is written once, the tools of a packed document are
+    # also called by its workflow
+    emitted = set()
     if parsed_cwl.tasks is not None:
         for task in parsed_cwl.tasks:
-            wdl_task = WdlTaskGenerator(task).generate_wdl()
-            wdl_parts.append(wdl_task)
+            if id(task) not in emitted:
+                emitted.add(id(task))
+                WdlTaskGenerator(task).generate_wdl(out)
 
     if parsed_cwl.workflow is not None:
-        wdl_workflow = WdlWorkflowGenerator(parsed_cwl.workflow).generate_wdl()
-        wdl_parts.append(wdl_workflow)
+        WdlWorkflowGenerator(parsed_cwl.workflow, emitted).generate_wdl(out)
+
+
+def write_wdl_stream(filename, out, diagnostics=None, resolver=None):
+    """Convert every document of a multi-document YAML file, writing the WDL
+    of each to out before the next one is read, so memory use is bounded by
+    the largest document rather than the whole stream. Imports resolve
+    relative to the file, through resolver if given. Returns the absolute
+    paths of every file read."""
+    dependencies = []
+    for cwl in load_stream(filename):
+        registry = ImportRegistry(diagnostics=diagnostics, resolver=resolver)
+        registry.add_document(filename, cwl)
+        # the registry hands the document over to the parser
+        del cwl
+        parser = CwlParser(filename, registry)
+        parsed_cwl = ParsedDocument(parser.parse_document())
+        write_wdl(parsed_cwl, out)
+        del parsed_cwl
+        for dependency in parser.dependencies:
+            if dependency not in dependencies:
+                dependencies.append(dependency)
+    return dependencies
+
+
+def convert(cwl, resolver=None, name="main.cwl", diagnostics=None):
+    """Convert a CWL document and return the WDL text.
+
+    cwl is the YAML or JSON text of the document, or the document already
+    loaded as a dict or list; if it is None the document 'name' is loaded
+    through the resolver. Imports are located relative to 'name' by the
+    resolver, e.g. a MappingResolver of documents held in memory, an
+    ArchiveResolver or a FileResolver. Without one nothing can be imported
+    and nothing is read from disk. Unsupported constructs are reported to
+    diagnostics, if given.
+    """
+    registry = ImportRegistry(
+        diagnostics=diagnostics,
+        resolver=resolver if resolver is not None else MappingResolver({})
+    )
+    if cwl is not None:
+        if isinstance(cwl, bytes):
+            cwl = cwl.decode("utf-8")
+        if not isinstance(cwl, (dict, list)):
+            cwl = load_text(cwl)
+        registry.add_document(name, cwl)
+
+    out = io.StringIO()
+    write_wdl(ParsedDocument(CwlParser(name, registry).parse_document()), out)
+    return out.getvalue()
+
+
+def validate_tasks(parsed_cwl, jobs=1, cache_dir=None, cache_size=None):
+    """Validate each task and workflow of parsed_cwl on its own, reporting
+    the outcome and timing of each to stderr. Results are cached in
+    cache_dir, if given, up to cache_size bytes (by default the size cap of
+    the document cache)."""
+    from cwl2wdl.validation import (ValidationCache, ValidationError,
+                                    validate_fragments, wdl_fragments)
+    if cache_size is None:
+        validation_cache = ValidationCache(cache_dir)
+    else:
+        validation_cache = ValidationCache(cache_dir, cache_size)
+    results = validate_fragments(wdl_fragments(parsed_cwl), jobs, validation_cache)
+    for result in results:
+        if result.error is None:
+            print("PASS %s (%s)" % (result.name, "cached" if result.cached else
+                                    "%.3fs" % (result.seconds)),
+                  file=sys.stderr)
+        else:
+            print("FAIL %s: %s" % (result.name, result.error), file=sys.stderr)
 
-    wdl_doc = str("\n".join(wdl_parts))
+    failed = [r for r in results if r.error is not None]
+    if failed:
+        raise ValidationError("%d of %d tasks failed validation." %
+                              (len(failed), len(results)))
 
-    if arguments.validate:
-        try:
-            is_validated = wdl.parser.parse(wdl_doc)
-        except Exception as e:
-            raise e
+
+def write_output_dir(parsed_cwl, outdir, zip_path=None, out=None):
+    """Write parsed_cwl to outdir as one WDL file per task and workflow and
+    optionally zip the imported files. The path of the top-level file is
+    printed to out."""
+    from cwl2wdl.multifile import wdl_files, write_files, write_zip
+    files = wdl_files(parsed_cwl)
+    written = write_files(files, outdir)
+    print("Wrote %d of %d files to %s, %d unchanged." %
+          (len(written), len(files), outdir, len(files) - len(written)),
+          file=sys.stderr)
+
+    if zip_path is not None:
+        # the top-level workflow is submitted on its own
+        imported = files[1:] if parsed_cwl.workflow is not None else files
+        if write_zip(imported, zip_path):
+            print("Wrote %d files to %s." % (len(imported), zip_path), file=sys.stderr)
+        else:
+            print("%s is unchanged." % (zip_path), file=sys.stderr)
+    if out is not None:
+        out.write(os.path.join(outdir, files[0][0]) + "\n")
+
+
+def run_conversion(arguments, cache, out, diagnostics):
+    """Run the conversion requested on the command line."""
+    try:
+        parsed_cwl = parse_file(arguments.FILE, cache, diagnostics)
+    except MultipleDocumentsError:
+        if (arguments.validate or arguments.validate_tasks or
+                arguments.format == "ast" or arguments.output_dir is not None):
+            raise ValueError("%s is a stream of several documents, which can "
+                             "only be converted to WDL on stdout or --output." %
+                             (arguments.FILE))
+        write_wdl_stream(arguments.FILE, out, diagnostics)
+        out.write("\n")
+        return
+
+    if arguments.validate_tasks:
+        validate_tasks(parsed_cwl, arguments.jobs,
+                       None if arguments.no_cache else
+                       os.path.join(arguments.cache_dir, "validation"),
+                       arguments.cache_size * 1024 * 1024)
+
+    if arguments.output_dir is not None:
+        if arguments.validate:
+            from cwl2wdl.validation import parse_wdl
+            buf = io.StringIO()
+            write_wdl(parsed_cwl, buf)
+            parse_wdl(buf.getvalue())
+        write_output_dir(parsed_cwl, arguments.output_dir, arguments.zip, out)
+        return
+
+    if not arguments.validate and arguments.format == "wdl":
+        write_wdl(parsed_cwl, out)
+        out.write("\n")
+        return
+
+    from cwl2wdl.validation import parse_wdl
+    buf = io.StringIO()
+    write_wdl(parsed_cwl, buf)
+    wdl_doc = buf.getvalue()
+
+    # the document is parsed once, for validation and the AST alike
+    if arguments.format == "ast" and not arguments.validate:
+        diagnostics.add("ast-implies-validation",
+                        "By specifying 'ast' format you are implicity imposing validation.")
+    parse_tree = parse_wdl(wdl_doc)
 
     if arguments.format == "ast":
-        warnings.warn("By specifying 'ast' format you are implicity imposing validation.")
-        ast = wdl.parser.parse(wdl_doc).ast()
-        print(ast.dumps(indent=2))
+        out.write(parse_tree.ast().dumps(indent=2) + "\n")
     else:
-        print(wdl_doc)
+        out.write(wdl_doc + "\n")
+
+
+def cli():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from cwl2wdl.batch import cli as batch_cli
+        return batch_cli(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from cwl2wdl.server import cli as serve_cli
+        return serve_cli(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "synthetic":
+        from cwl2wdl.synthetic import cli as synthetic_cli
+        return synthetic_cli(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "inputs":
+        from cwl2wdl.jobs import cli as inputs_cli
+        return inputs_cli(sys.argv[2:])
+
+    parser = collect_args()
+    arguments = parser.parse_args()
+    if arguments.output_dir is not None and (arguments.output is not None or
+                                             arguments.format == "ast"):
+        parser.error("--output-dir writes WDL files, it can't be combined "
+                     "with --output or the ast format")
+    if arguments.zip is not None and arguments.output_dir is None:
+        parser.error("--zip requires --output-dir")
+
+    if os.path.exists(arguments.FILE):
+        pass
+    else:
+        raise IOError("%s does not exist." % (arguments.FILE))
+
+    cache = cache_from_args(arguments)
+    if arguments.output is not None:
+        out = io.open(arguments.output, "w", encoding="utf-8")
+    else:
+        out = sys.stdout
+
+    from cwl2wdl import tracing
+    diagnostics = Diagnostics()
+    if arguments.profile or arguments.trace is not None:
+        tracing.start()
+    try:
+        with tracing.span("convert %s" % (os.path.basename(arguments.FILE))):
+            run_conversion(arguments, cache, out, diagnostics)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if len(diagnostics):
+            print(diagnostics.summary(), file=sys.stderr)
+        if arguments.diagnostics is not None:
+            diagnostics.write(arguments.diagnostics)
+        tracer = tracing.stop()
+        if tracer is not None and arguments.trace is not None:
+            tracer.write(arguments.trace)
+        if tracer is not None and arguments.profile:
+            print(tracer.summary(), file=sys.stderr)
@@ -0,0 +1,150 @@
+"""
+Multi-file WDL output: one file per task and workflow, linked by imports
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import os
+import re
+
+from cwl2wdl import tracing, wdl_model
+from cwl2wdl.generators import WdlTaskGenerator, WdlWorkflowGenerator
+
+
+# fixed timestamp of the zip entries, so an unchanged bundle is byte for
+# byte the same
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def wdl_files(parsed_cwl):
+    """Render every task and workflow of parsed_cwl to its own file.
+
+    Returns a list of (filename, text), the top-level workflow first. The
+    files sit side by side, named after the definition they hold, and a
+    workflow imports the files of the definitions it calls as namespaces
+    named after the file, e.g. `import "bwa_mem.wdl" as bwa_mem_wdl`, which
+    can't collide with the names of the calls.
+    """
+    # id() of a definition -> the name of its file without .wdl, and the
+    # (name, definition, kind) in the order they are first reached
+    stems = {}
+    order = []
+    taken = set()
+
+    def add(definition, kind):
+        if id(definition) in stems:
+            return
+        stem = _file_stem(definition.name, taken)
+        stems[id(definition)] = stem
+        order.append((stem, definition, kind))
+
+    if parsed_cwl.workflow is not None:
+        add(parsed_cwl.workflow, "workflow")
+    # breadth first, every definition is visited once
+    i = 0
+    while i < len(order):
+        stem, definition, kind = order[i]
+        i += 1
+        if kind == "workflow":
+            for step in definition.steps + definition.subworkflows:
+                if step.task_definition is not None:
+                    add(step.task_definition, step.step_type)
+    for task in parsed_cwl.tasks or []:
+        add(task, "task")
+
+    files = []
+    for stem, definition, kind in order:
+        with tracing.span("render %s.wdl" % (stem), "generate"):
+            if kind == "task":
+                text = WdlTaskGenerator(definition).generate_wdl()
+            else:
+                text = _render_workflow(definition, stems)
+        files.append((stem + ".wdl", text.lstrip("\n")))
+    return files
+
+
+def write_files(files, outdir):
+    """Write (filename, text) pairs into outdir. Files whose content is
+    unchanged are left alone, so their mtimes stay stable. Returns the
+    names of the files written."""
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    written = []
+    for filename, text in files:
+        if _write_if_changed(os.path.join(outdir, filename), text.encode("utf-8")):
+            written.append(filename)
+    tracing.count("files written", len(written))
+    return written
+
+
+def write_zip(files, zip_path):
+    """Write (filename, text) pairs to a zip archive, e.g. the imports of a
+    workflow for Cromwell's workflowDependencies. The archive is only
+    rewritten when its content changed. Returns whether it was written."""
+    import zipfile
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for filename, text in sorted(files):
+            info = zipfile.ZipInfo(filename, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            bundle.writestr(info, text.encode("utf-8"))
+    return _write_if_changed(zip_path, buf.getvalue())
+
+
+############################
+# Helper functions
+############################
+def _file_stem(name, taken):
+    """A file name for definition 'name', without .wdl, that is a WDL
+    identifier once suffixed with _wdl and distinct from the ones taken
+    already."""
+    stem = re.sub("[^A-Za-z0-9_]", "_", name)
+    if not re.match("[A-Za-z]", stem):
+        stem = "wdl_" + stem
+    candidate = stem
+    n = 1
+    while candidate in taken:
+        n += 1
+        candidate = "%s_%d" % (stem, n)
+    taken.add(candidate)
+    return candidate
+
+
+def _render_workflow(workflow, stems):
+    generator = WdlWorkflowGenerator(workflow)
+    imports = []
+    for step in generator.ordered_steps:
+        definition = step.task_definition
+        if definition is None or id(definition) in generator.namespaces:
+            continue
+        stem = stems[id(definition)]
+        generator.namespaces[id(definition)] = stem + "_wdl"
+        imports.append(wdl_model.Import(stem + ".wdl", stem + "_wdl"))
+
+    out = io.StringIO()
+    printer = wdl_model.WdlPrinter(out)
+    for node in imports:
+        printer.write(node)
+    printer.write(generator.build())
+    tracing.count("workflows generated")
+    return out.getvalue()
+
+
+def _write_if_changed(path, data):
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as handle:
+                if handle.read() == data:
+                    return False
+    except (IOError, OSError):
+        pass
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, "wb") as handle:
+        handle.write(data)
+    return True
@@ -8,25 +8,255 @@ from __future__ import unicode_literals
 
 import os
 import re
-import warnings
-import yaml
+import threading
+
+from cwl2wdl import tracing
+from cwl2wdl.diagnostics import Diagnostics
+from cwl2wdl.resolvers import FileResolver
+from cwl2wdl.typemap import resolve_type
+
+
+# number of threads used to read the files of an import tree
+PREFETCH_THREADS = 8
+
+# documents importing each other deeper than this are rejected before the
+# interpreter's recursion limit is hit
+MAX_IMPORT_DEPTH = 100
+
+
+# Requirement fragments pulled in with $import (e.g. the *-docker.cwl files)
+# are shared by many tools, so their parsed requirements are kept for the
+# whole session. Maps location -> (version, requirements, dependencies,
+# diagnostics, fingerprints), for the resolvers that can tell the version of a
+# document. The fingerprints of the files read, if the resolver took them,
+# are replayed along with the dependencies.
+_requirement_imports = {}
+
+
+def clear_requirement_imports():
+    _requirement_imports.clear()
+
+
+def find_imports(cwl, sourceDir, resolver=None):
+    """Return the locations of the step ('run') and requirement ('import' /
+    '$import') documents referenced anywhere in a loaded document, as two
+    lists. Files are looked up unless another resolver is given."""
+    if resolver is None:
+        resolver = FileResolver()
+
+    steps = []
+    requirements = []
+    pending = [cwl]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                if key == 'run' and isinstance(value, dict):
+                    # the import form of 'run' is a step, any other import
+                    # is a requirement fragment
+                    value = value.get('import', value.get('$import', value))
+
+                if isinstance(value, (dict, list)):
+                    pending.append(value)
+                elif not isinstance(value, str) or value.startswith("#"):
+                    continue
+                elif key == 'run':
+                    steps.append(value)
+                elif key in ('import', '$import'):
+                    requirements.append(value)
+
+    def resolved(references):
+        found = [resolver.resolve(ref, sourceDir) for ref in references]
+        return [f for f in found if f is not None]
+    return resolved(steps), resolved(requirements)
+
+
+def _requirement_import_is_current(location, resolver):
+    cached = _requirement_imports.get(location)
+    if cached is None:
+        return False
+    version = resolver.version(location)
+    return version is not None and cached[0] == version
+
+
+def _thread_map(function, items, threads):
+    """map() over items in up to 'threads' threads. multiprocessing.pool
+    would double the import time of a plain conversion."""
+    results = [None] * len(items)
+    pending = iter(enumerate(items))
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                try:
+                    i, item = next(pending)
+                except StopIteration:
+                    return
+            results[i] = function(item)
+
+    workers = [threading.Thread(target=work) for _ in range(min(threads, len(items)))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+class ImportRegistry(object):
+    """Documents imported during a single conversion, keyed by location.
+
+    Every imported file is parsed once, no matter how many steps or nested
+    workflows reference it. 'hits' counts the imports served from the
+    registry, 'misses' the ones that had to be parsed.
+
+    prefetch() reads a whole import tree up front, 'threads' files at a time.
+    Issues found by any parser of the conversion go to 'diagnostics'.
+    Documents are located and loaded by 'resolver', a FileResolver unless
+    another one is given.
+    """
+    def __init__(self, threads=PREFETCH_THREADS, diagnostics=None, resolver=None):
+        self.documents = {}
+        self.resolver = resolver if resolver is not None else FileResolver()
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+        self.hits = 0
+        self.misses = 0
+        self.threads = threads
+        self.__in_progress = set()
+        # loaded but not yet parsed documents, by location
+        self.__prefetched = {}
+
+    def add_document(self, filename, cwl):
+        """Provide the already loaded document for filename, e.g. one that
+        was received over the network and never written to disk."""
+        self.__prefetched[self.resolver.location(filename)] = cwl
+
+    def load(self, filename):
+        """Return the loaded document for filename, prefetched if possible."""
+        key = self.resolver.location(filename)
+        if key in self.__prefetched:
+            return self.__prefetched.pop(key)
+        return self.resolver.load(key)
+
+    def prefetch(self, filename):
+        """Load filename and every file it imports, directly or indirectly.
+
+        The tree is read level by level, with all the files of a level
+        loaded concurrently, so the wall clock time grows with the depth of
+        the import tree rather than the number of imports.
+        """
+        with tracing.span("prefetch %s" % (os.path.basename(filename)), "load"):
+            self.__prefetch_tree(filename)
+
+    def __prefetch_tree(self, filename):
+        level = [self.resolver.location(filename)]
+        seen = set(level)
+        while level:
+            if len(level) > 1 and self.threads > 1:
+                loaded = _thread_map(self.__load_if_possible, level, self.threads)
+            else:
+                loaded = [self.__load_if_possible(f) for f in level]
+
+            next_level = []
+            for path, cwl in zip(level, loaded):
+                if cwl is None:
+                    continue
+                self.__prefetched[path] = cwl
+                steps, requirements = find_imports(cwl, self.resolver.base(path),
+                                                   self.resolver)
+                for ref in steps:
+                    if ref not in seen and ref not in self.documents:
+                        seen.add(ref)
+                        next_level.append(ref)
+                for ref in requirements:
+                    if ref not in seen and \
+                            not _requirement_import_is_current(ref, self.resolver):
+                        seen.add(ref)
+                        next_level.append(ref)
+            level = next_level
+
+    def __load_if_possible(self, location):
+        if location in self.__prefetched:
+            return self.__prefetched[location]
+        try:
+            return self.resolver.load(location)
+        except Exception:
+            # left for the parser to load again and report
+            return None
+
+    def import_document(self, filename):
+        """Return the parsed document and the dependencies of filename."""
+        key = self.resolver.location(filename)
+        if key in self.documents:
+            self.hits += 1
+            tracing.count("import registry hits")
+            return self.documents[key]
+
+        if key in self.__in_progress:
+            raise ImportError("Circular import of %s" % (filename))
+        if len(self.__in_progress) >= MAX_IMPORT_DEPTH:
+            raise ImportError("Imports are nested more than %d levels deep at %s" %
+                              (MAX_IMPORT_DEPTH, filename))
+
+        self.misses += 1
+        tracing.count("import registry misses")
+        self.__in_progress.add(key)
+        try:
+            parser = CwlParser(key, registry=self)
+            self.documents[key] = (parser.parse_document(), parser.dependencies)
+        finally:
+            self.__in_progress.discard(key)
+        return self.documents[key]
 
 
 class CwlParser(object):
-    def __init__(self, sourceFile):
+    def __init__(self, sourceFile, registry=None, diagnostics=None, resolver=None):
         self.sourceFile = sourceFile
+        # shared with the parsers of imported steps and subworkflows
+        self.__prefetch = registry is None
+        self.registry = registry if registry is not None else ImportRegistry(
+            diagnostics=diagnostics, resolver=resolver)
+        self.diagnostics = self.registry.diagnostics
+        # document the issues being reported were found in
+        self.__location = self.registry.resolver.location(sourceFile)
+        # locations (absolute paths, for files) of every document read while
+        # parsing the document, including step and requirement imports
+        self.dependencies = []
+        # one copy of each step input source, which large workflows repeat
+        # many times over
+        self.__strings = {}
+        # processes of a packed document by id, and their parsed form by
+        # id() of the process
+        self.__graph = None
+        self.__graph_parsed = {}
+        self.__graph_name = None
+        self.__graph_depth = 0
+        # prefix of the ids within the packed process being parsed
+        self.__graph_prefix = None
 
     def parse_document(self):
         parentFileName = re.sub("(\.yaml)", "", os.path.basename(self.sourceFile))
-        sourceDir = os.path.dirname(os.path.abspath(self.sourceFile))
+        location = self.registry.resolver.location(self.sourceFile)
+        sourceDir = self.registry.resolver.base(location)
+        self.__add_dependency(location)
+
+        if self.__prefetch:
+            self.registry.prefetch(location)
+        cwl = self.registry.load(location)
+
+        kind = cwl.get('class') if isinstance(cwl, dict) else None
+        with tracing.span("parse %s" % (os.path.basename(self.sourceFile)),
+                          "parse", kind=kind):
+            return self.__parse_cwl(cwl, sourceDir, parentFileName)
 
-        handle = open(self.sourceFile)
-        cwl = yaml.load(handle.read())
-        handle.close()
+    def __parse_cwl(self, cwl, sourceDir, parentFileName):
+        if isinstance(cwl, dict) and '$graph' in cwl:
+            tasks, workflow = self.__parse_cwl_graph(cwl['$graph'], sourceDir, parentFileName)
 
-        if isinstance(cwl, list):
-            tasks = [self.__parse_cwl_task(part, sourceDir) for part in cwl if part['class'] == 'CommandLineTool']
-            workflow = [self.__parse_cwl_workflow(part, sourceDir, parentFileName) for part in cwl if part['class'] == 'Workflow'][0]
+        elif isinstance(cwl, list):
+            tasks, workflow = self.__parse_cwl_graph(cwl, sourceDir, parentFileName)
 
         elif isinstance(cwl, dict):
             if cwl['class'] == 'CommandLineTool':
@@ -42,6 +272,87 @@ class CwlParser(object):
 
         return {"tasks": tasks, "workflow": workflow}
 
+    def __parse_cwl_graph(self, graph, sourceDir, parentFileName):
+        """Parse a packed document, a list of processes or the '$graph' of
+        one, into its tools and its top-level workflow.
+
+        Steps refer to the processes by '#id', which is looked up in an
+        index of the graph. Every process is parsed once, so a tool called
+        by several steps is a single task definition.
+        """
+        self.__graph = {}
+        for process in graph:
+            if 'id' in process:
+                self.__graph[process['id'].strip('#')] = process
+        self.__graph_name = parentFileName
+
+        root = self.__graph_root(graph)
+        workflow = None
+        if root is not None:
+            workflow = self.__parse_graph_process(root, sourceDir)
+
+        tasks = [self.__parse_graph_process(process, sourceDir) for process in graph
+                 if process['class'] == 'CommandLineTool']
+
+        for process in graph:
+            if process['class'] == 'Workflow' and id(process) not in self.__graph_parsed:
+                self.__warn("unreachable-workflow",
+                            "Workflow %s is not called by %s, a WDL document "
+                            "has a single top-level workflow." %
+                            (process.get('id', "").strip('#'), workflow['name']))
+        return tasks, workflow
+
+    def __graph_root(self, graph):
+        """The top-level workflow of a packed document: the one 'cwltool
+        --pack' names main, else the first one no step refers to."""
+        workflows = [p for p in graph if p['class'] == 'Workflow']
+        if not workflows:
+            return None
+        main = self.__graph.get('main')
+        if main is not None and main['class'] == 'Workflow':
+            return main
+
+        referenced = set()
+        for workflow in workflows:
+            for step in workflow.get('steps', []):
+                run = step.get('run')
+                if isinstance(run, dict):
+                    run = run.get('import', run.get('$import'))
+                if isinstance(run, str) and run.startswith("#"):
+                    referenced.add(run.strip('#'))
+        for workflow in workflows:
+            if workflow.get('id', "").strip('#') not in referenced:
+                return workflow
+        return workflows[0]
+
+    def __parse_graph_process(self, process, sourceDir):
+        key = id(process)
+        if key in self.__graph_parsed:
+            parsed = self.__graph_parsed[key]
+            if parsed is None:
+                raise ImportError("Circular reference to %s" % (process.get('id')))
+            return parsed
+
+        self.__graph_depth += 1
+        if self.__graph_depth > MAX_IMPORT_DEPTH:
+            raise ImportError("Processes are nested more than %d levels deep at %s" %
+                              (MAX_IMPORT_DEPTH, process.get('id')))
+        self.__graph_parsed[key] = None
+        outer_prefix = self.__graph_prefix
+        self.__graph_prefix = process.get('id', "").strip('#') + "/"
+        try:
+            if process['class'] == 'CommandLineTool':
+                parsed = self.__parse_cwl_task(process, sourceDir)
+            elif process['class'] == 'Workflow':
+                parsed = self.__parse_cwl_workflow(process, sourceDir, self.__graph_name)
+            else:
+                raise TypeError("Unrecognized CWL class: %s" % (process['class']))
+        finally:
+            self.__graph_prefix = outer_prefix
+            self.__graph_depth -= 1
+        self.__graph_parsed[key] = parsed
+        return parsed
+
     def __parse_cwl_task(self, cwl_task, sourceDir):
         if 'label' in cwl_task:
             name = re.sub("( |\.)", "_", cwl_task['label'])
@@ -83,7 +394,8 @@ class CwlParser(object):
                     re.sub("(inputs\.|^\$\(|\)$)", "", cwl_task['stdout'])
                 )
             else:
-                warnings.warn("Can't evaluate expression: %s in stdout" % (cwl_task['stdout']))
+                self.__warn("unsupported-expression",
+                            "Can't evaluate expression in stdout: %s" % (cwl_task['stdout']))
                 stdout = str(cwl_task['stdout'])
         else:
             stdout = None
@@ -92,7 +404,8 @@ class CwlParser(object):
             if isinstance(cwl_task['stdin'], str):
                 stdin = cwl_task['stdin']
             else:
-                warnings.warn("Can't evaluate expression: %s in stdin" % (cwl_task['stdin']))
+                self.__warn("unsupported-expression",
+                            "Can't evaluate expression in stdin: %s" % (cwl_task['stdin']))
                 stdin = str(cwl_task['stdin'])
         else:
             stdin = None
@@ -113,7 +426,7 @@ class CwlParser(object):
 
         inputs = self.__parse_cwl_inputs(cwl_workflow['inputs'])
         outputs = self.__parse_cwl_outputs(cwl_workflow['outputs'])
-        steps = self.__parse_cwl_workflow_steps(cwl_workflow['steps'], sourceDir)
+        steps, subworkflows = self.__parse_cwl_workflow_steps(cwl_workflow['steps'], sourceDir)
 
         if ('requirements' in cwl_workflow) and ('hints' in cwl_workflow):
             requirements = self.__parse_cwl_requirements(
@@ -132,7 +445,8 @@ class CwlParser(object):
             requirements = []
 
         return {"name": name, "inputs": inputs, "outputs": outputs,
-                "steps": steps, "requirements": requirements}
+                "steps": steps, "subworkflows": subworkflows,
+                "requirements": requirements}
 
     ############################
     # sub-section parsers
@@ -168,13 +482,13 @@ class CwlParser(object):
         if isinstance(cwl_arguments, list):
             for arg in cwl_arguments:
                 if isinstance(arg, str):
-                    arguments.append({'prefix': None, 'postion': None,
+                    arguments.append({'prefix': None, 'position': None,
                                       'separator': None, 'value': arg})
                 elif isinstance(arg, dict):
                     arguments.append(self.__parse_cwl_command_line_binding(arg))
 
         elif isinstance(cwl_arguments['arguments'], str):
-            arguments.append({'prefix': None, 'postion': None,
+            arguments.append({'prefix': None, 'position': None,
                               'separator': None, 'value': cwl_arguments})
 
         elif isinstance(cwl_arguments['arguments'], dict):
@@ -186,10 +500,9 @@ class CwlParser(object):
         inputs = []
         for cwl_input in cwl_inputs:
             name = self.__check_variable_value_for_reserved_syntax(
-                cwl_input['id'].strip("#")
+                self.__local_id(cwl_input['id'])
             )
-            is_required = self.__check_if_required(cwl_input['type'])
-            variable_type = self.__remap_type_cwl2wdl(cwl_input['type'])
+            variable_type, is_required = resolve_type(cwl_input['type'])
 
             if 'inputBinding' in cwl_input:
                 inputBinding = self.__parse_cwl_command_line_binding(cwl_input['inputBinding'])
@@ -212,7 +525,8 @@ class CwlParser(object):
                 if isinstance(value, str):
                     default = value
                 else:
-                    warnings.warn("Expressions are not supported.")
+                    self.__warn("unsupported-expression",
+                                "Expressions are not supported (input %s)." % (name))
                     default = str(value)
             else:
                 default = None
@@ -228,10 +542,9 @@ class CwlParser(object):
         outputs = []
         for cwl_output in cwl_outputs:
             name = self.__check_variable_value_for_reserved_syntax(
-                cwl_output['id'].strip("#")
+                self.__local_id(cwl_output['id'])
             )
-            is_required = self.__check_if_required(cwl_output['type'])
-            variable_type = self.__remap_type_cwl2wdl(cwl_output['type'])
+            variable_type, is_required = resolve_type(cwl_output['type'])
 
             if 'outputBinding' in cwl_output:
                 if 'glob' in cwl_output['outputBinding']:
@@ -241,14 +554,27 @@ class CwlParser(object):
                         )
                         output = 'glob(\'${%s}\')' % (value)
                     else:
-                        warnings.warn("Cannot evaluate expression within a 'glob' outputBinding.")
+                        self.__warn("unsupported-expression",
+                                    "Cannot evaluate expression within the 'glob' "
+                                    "outputBinding of %s." % (name))
                         output = 'glob(\'${%s}\')' % (cwl_output['outputBinding']['glob'])
                 else:
-                    warnings.warn("Unsupported outputBinding: %s" % (cwl_output['outputBinding']))
+                    self.__warn("unsupported-output-binding",
+                                "Unsupported outputBinding of %s: %s" %
+                                (name, ", ".join(sorted(cwl_output['outputBinding']))))
                     output = cwl_output['outputBinding']
 
+            elif 'outputSource' in cwl_output or 'source' in cwl_output:
+                # workflow output, bound to step outputs
+                sources = cwl_output.get('outputSource', cwl_output.get('source'))
+                if not isinstance(sources, list):
+                    sources = [sources]
+                output = self.__share(" ".join([self.__local_id(str(v)) for v in sources]))
+
             else:
-                warnings.warn("Not sure how to handle this output: %s" % (cwl_output))
+                self.__warn("missing-output-binding",
+                            "Not sure how to handle output %s without an "
+                            "outputBinding." % (name))
                 output = None
 
             parsed_output = {"name": name,
@@ -271,8 +597,9 @@ class CwlParser(object):
                         value = cwl_requirement['dockerPull']
                     else:
                         req_type_err = [key for key in cwl_requirement.keys() if key.startswith("docker")]
-                        warnings.warn(
-                            "Unsupported docker requirement type: %s" % (" ".join(req_type_err)))
+                        self.__warn("unsupported-docker-requirement",
+                                    "Unsupported docker requirement type: %s" %
+                                    (" ".join(sorted(req_type_err))))
                         continue
                 # enviroment variables
                 elif cwl_requirement['class'] == 'EnvVarRequirement':
@@ -283,16 +610,20 @@ class CwlParser(object):
 
                 # hard/soft system requirements
                 elif cwl_requirement['class'] == 'ResourceRequirement':
-                    warnings.warn("Resource requirements are not currently supported.")
+                    self.__warn("unsupported-resource-requirement",
+                                "Resource requirements are not currently supported.")
                     continue
 
                 # inline javascript is not supported
                 elif cwl_requirement['class'] == 'InlineJavascriptRequirement':
-                    warnings.warn("'InlineJavascript' requirement is not supported.")
+                    self.__warn("unsupported-inline-javascript",
+                                "'InlineJavascript' requirement is not supported.")
                     continue
 
                 else:
-                    warnings.warn("The CWL requirement class: %s, is not supported" % (cwl_requirement['class']))
+                    self.__warn("unsupported-requirement",
+                                "The CWL requirement class: %s, is not supported" %
+                                (cwl_requirement['class']))
                     continue
 
             elif ('import' in cwl_requirement) or ('$import' in cwl_requirement):
@@ -301,27 +632,19 @@ class CwlParser(object):
                 except:
                     to_import = cwl_requirement['$import']
 
-                if os.path.exists(to_import):
-                    file_to_import = to_import
-                elif os.path.exists(os.path.join(sourceDir, to_import)):
-                    file_to_import = os.path.join(sourceDir, to_import)
-                else:
-                    warnings.warn("Couldn't find file: %s" % (to_import))
+                file_to_import = self.registry.resolver.resolve(to_import, sourceDir)
+                if file_to_import is None:
+                    self.__warn("import-not-found", "Couldn't find file: %s" % (to_import))
                     continue
 
-                handle = open(file_to_import)
-                imported_yaml = yaml.load(handle.read())
-                handle.close()
-
-                if isinstance(imported_yaml, list):
-                    imported_requirements = self.__parse_cwl_requirements(imported_yaml)
-                else:
-                    imported_requirements = self.__parse_cwl_requirements([imported_yaml])
-
-                requirements += imported_requirements
+                with tracing.span("import %s" % (os.path.basename(file_to_import)),
+                                  "requirements"):
+                    requirements += self.__import_cwl_requirements(file_to_import)
                 continue
             else:
-                warnings.warn("The CWL requirement: %s, is not supported" % (cwl_requirement))
+                self.__warn("unsupported-requirement",
+                            "The CWL requirement: %s, is not supported" %
+                            (", ".join(sorted(cwl_requirement))))
                 continue
 
             parsed_requirement = {"requirement_type": requirement_type,
@@ -330,66 +653,159 @@ class CwlParser(object):
 
         return requirements
 
+    def __import_cwl_requirements(self, file_to_import):
+        key = file_to_import
+        version = self.registry.resolver.version(key)
+
+        read = getattr(self.registry.resolver, "fingerprints", None)
+
+        cached = _requirement_imports.get(key) if version is not None else None
+        if cached is not None and cached[0] == version:
+            tracing.count("requirement import hits")
+            imported_requirements, dependencies, diagnostics, fingerprints = cached[1:]
+            if read is not None:
+                for dependency, fingerprint in fingerprints.items():
+                    read.setdefault(dependency, fingerprint)
+        else:
+            # collect the dependencies and diagnostics of the fragment on
+            # their own, so they can be replayed whenever the cached fragment
+            # is reused
+            outer_dependencies = self.dependencies
+            outer_diagnostics = self.diagnostics
+            outer_location = self.__location
+            self.dependencies = [key]
+            self.diagnostics = Diagnostics()
+            self.__location = key
+            try:
+                imported_yaml = self.registry.load(key)
+
+                if not isinstance(imported_yaml, list):
+                    imported_yaml = [imported_yaml]
+                imported_requirements = self.__parse_cwl_requirements(
+                    imported_yaml, self.registry.resolver.base(key)
+                )
+            finally:
+                dependencies = self.dependencies
+                diagnostics = self.diagnostics.records()
+                self.dependencies = outer_dependencies
+                self.diagnostics = outer_diagnostics
+                self.__location = outer_location
+            if version is not None:
+                fingerprints = dict((d, read[d]) for d in dependencies
+                                    if read is not None and d in read)
+                _requirement_imports[key] = (version, imported_requirements,
+                                             dependencies, diagnostics,
+                                             fingerprints)
+
+        for dependency in dependencies:
+            self.__add_dependency(dependency)
+        self.diagnostics.extend(diagnostics)
+        return list(imported_requirements)
+
     def __parse_cwl_workflow_steps(self, workflow_steps, sourceDir):
         steps = []
+        subworkflows = []
         for step in workflow_steps:
-            if 'import' in step['run']:
-                task_id = re.sub('(\.cwl|#)', '', os.path.basename(step['run']['import']))
-                if 'import' in step['run']['import'].endswith(".cwl"):
-                    import_statement = "import " + step['run']['import']
-                    to_import = step['run']['import']
-
-            elif step['run'].endswith(".cwl"):
-                task_id = re.sub('(\.cwl|#)', '', os.path.basename(step['run']))
-                import_statement = "import " + step['run']
-                to_import = step['run']
-
-            else:
-                task_id = re.sub('(\.cwl|#)', '', os.path.basename(step['run']))
+            run = step['run']
+            inline = False
+            if isinstance(run, dict):
+                if 'import' in run:
+                    run = run['import']
+                elif '$import' in run:
+                    run = run['$import']
+                else:
+                    self.__warn("unsupported-inline-step",
+                                "Inline step definitions are not supported (step %s)." %
+                                (step.get('id', "").strip('#')))
+                    run = step['id']
+                    inline = True
+
+            task_id = re.sub('(\.cwl|#)', '', os.path.basename(run))
+            imported_cwl_task = None
+            imported_cwl_workflow = None
+            if run.startswith("#"):
+                # reference to a process in the same document
                 to_import = None
                 import_statement = None
+                process = self.__graph.get(run.strip('#')) if self.__graph else None
+                if process is not None:
+                    parsed_process = self.__parse_graph_process(process, sourceDir)
+                    task_id = parsed_process['name']
+                    if process['class'] == 'Workflow':
+                        imported_cwl_workflow = parsed_process
+                    else:
+                        imported_cwl_task = parsed_process
+                elif not inline:
+                    self.__warn("process-not-found",
+                                "No process %s in the document." % (run))
+            else:
+                import_statement = "import " + run
+                to_import = run
 
             if to_import is not None:
-                if os.path.exists(to_import):
-                    file_to_import = to_import
-                elif os.path.exists(os.path.join(sourceDir, to_import)):
-                    file_to_import = os.path.join(sourceDir, to_import)
-                else:
+                file_to_import = self.registry.resolver.resolve(to_import, sourceDir)
+                if file_to_import is None:
                     raise IOError("Couldn't find file: %s" % (to_import))
-                imported_cwl_task = CwlParser(file_to_import).parse_document()['tasks']
-            else:
-                imported_cwl_task = None
+
+                imported_doc, dependencies = self.registry.import_document(file_to_import)
+                for dependency in dependencies:
+                    self.__add_dependency(dependency)
+
+                if imported_doc['workflow'] is not None:
+                    imported_cwl_workflow = imported_doc['workflow']
+                else:
+                    imported_cwl_task = imported_doc['tasks'][0]
 
             inputs = []
-            for step_input in step['inputs']:
-                input_id = step_input['id'].strip('#')
+            # draft-3 'inputs'/'outputs', v1.0 'in'/'out'
+            step_inputs = step['in'] if 'in' in step else step['inputs']
+            for step_input in self.__id_list(step_inputs, 'source'):
+                input_id = self.__local_id(step_input['id'])
                 if 'source' in step_input:
-                    value = step_input['source']
+                    sources = step_input['source']
+                    if not isinstance(sources, list):
+                        sources = [sources]
+                    source = [self.__share(self.__local_id(str(v))) for v in sources]
+                    value = self.__share(" ".join(source))
                 elif 'default' in step_input:
                     value = step_input['default']
+                    source = []
                 else:
                     value = None
+                    source = []
 
-                if value is not None:
+                if value is not None and 'source' not in step_input:
                     if isinstance(value, list):
-                        value = " ".join([v.strip('#') for v in value])
+                        value = self.__share(" ".join([v.strip('#') for v in value]))
                     else:
-                        value = str(value).strip('#')
+                        value = self.__share(str(value).strip('#'))
 
-                inputs.append({'id': input_id, "value": value})
+                inputs.append({'id': input_id, "value": value, "source": source})
 
             outputs = []
-            for o in step['outputs']:
-                o['id'] = o['id'].strip('#')
-                outputs.append(o)
+            step_outputs = step['out'] if 'out' in step else step['outputs']
+            for o in self.__id_list(step_outputs):
+                # a copy, the loaded document may belong to the caller
+                outputs.append(dict(o, id=self.__local_id(o['id'])))
+
+            step_id = self.__local_id(step['id']) if 'id' in step else task_id
+
+            if imported_cwl_workflow is not None:
+                subworkflows.append({"id": task_id,
+                                     "step_id": step_id,
+                                     "inputs": inputs,
+                                     "outputs": outputs,
+                                     "definition": imported_cwl_workflow})
+                continue
 
             parsed_step = {"task_id": task_id,
+                           "step_id": step_id,
                            "inputs": inputs,
                            "outputs": outputs,
                            "task_definition": imported_cwl_task,
                            "import_statement": import_statement}
             steps.append(parsed_step)
-        return steps
+        return steps, subworkflows
 
     def __expression_converter(self, expression):
         # TODO
@@ -398,6 +814,43 @@ class CwlParser(object):
     ############################
     # Helper functions
     ############################
+    def __warn(self, code, message):
+        self.diagnostics.add(code, message, self.__location)
+
+    def __id_list(self, entries, field=None):
+        """Entries of a step's in/out as a list of dicts with an 'id'. The
+        map form {id: entry} and plain strings are accepted, a plain value
+        standing for 'field' of the entry."""
+        if not isinstance(entries, dict):
+            return [e if isinstance(e, dict) else {'id': e} for e in entries]
+
+        listed = []
+        for k, v in entries.items():
+            if isinstance(v, dict):
+                listed.append(dict(v, id=k))
+            elif field is not None and v is not None:
+                listed.append({'id': k, field: v})
+            else:
+                listed.append({'id': k})
+        return listed
+
+    def __share(self, string):
+        return self.__strings.setdefault(string, string)
+
+    def __local_id(self, identifier):
+        identifier = identifier.strip('#')
+        # ids in packed documents are also qualified by their process, e.g.
+        # main/step1/out
+        if self.__graph_prefix is not None and \
+                identifier.startswith(self.__graph_prefix):
+            identifier = identifier[len(self.__graph_prefix):]
+        # step1/out (v1.0, draft-3 sources) is step1.out in WDL
+        return identifier.replace("/", ".")
+
+    def __add_dependency(self, filename):
+        if filename not in self.dependencies:
+            self.dependencies.append(filename)
+
     def __check_variable_value_for_reserved_syntax(self, variable):
         wdl_reserved_words = ("call", "task", "workflow", "import", "input",
                               "output", "as", "if", "while", "runtime",
@@ -407,76 +860,3 @@ class CwlParser(object):
             return "_".join([variable, "variable"])
         else:
             return variable
-
-    def __check_if_required(self, input_type):
-        if isinstance(input_type, list):
-            if 'null' in input_type:
-                is_required = False
-            else:
-                is_required = True
-
-        elif isinstance(input_type, dict):
-            is_required = self.__check_if_required(input_type['type'])
-
-        elif isinstance(input_type, str):
-            if input_type == 'null':
-                is_required = False
-            else:
-                is_required = True
-
-        return is_required
-
-    def __remap_type_cwl2wdl(self, input_type):
-        "Remaps CWL types to WDL types. Also determines if variable is required."
-        # Map Literals not currently supported
-        # Key is CWL type
-        # Value is corresponding WDL type
-        type_map = {"File": "File",
-                    "string": "String",
-                    "boolean": "Boolean",
-                    "int": "Int",
-                    "long": "Float",
-                    "float": "Float",
-                    "double": "Float",
-                    "array-File": "Array[File]",
-                    "array-string": "Array[String]",
-                    "array-int": "Array[Int]",
-                    "array-long": "Array[Float]",
-                    "array-float": "Array[Float]",
-                    "array-double": "Array[Float]"}
-
-        if isinstance(input_type, str):
-            cwl_type = input_type
-
-        elif isinstance(input_type, list):
-            if 'null' in input_type:
-                # select the non-null type
-                cwl_type = [i for i in input_type if i != 'null'][0]
-
-            if isinstance(cwl_type, dict):
-                if cwl_type['type'] == "array":
-                    cwl_type = "-".join([cwl_type['type'],
-                                         cwl_type['items']])
-
-                elif cwl_type['type'] == "enum":
-                    raise KeyError('Unsupported CWL type: enum')
-
-                elif cwl_type['type'] == "record":
-                    raise KeyError('Unsupported CWL type: record')
-
-        elif isinstance(input_type, dict):
-            if input_type['type'] == "array":
-                cwl_type = "-".join([input_type['type'],
-                                     input_type['items']])
-
-            elif input_type['type'] == "enum":
-                raise KeyError('Unsupported CWL type: enum')
-
-            elif input_type['type'] == "record":
-                raise KeyError('Unsupported CWL type: record')
-
-        try:
-            variable_type = type_map[cwl_type]
-            return variable_type
-        except KeyError:
-            raise KeyError('Unrecognized CWL type: %s' % (cwl_type))
@@ -0,0 +1,158 @@
+"""
+Resolvers locating and loading the documents a CWL document imports
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import posixpath
+import threading
+
+from cwl2wdl import tracing
+from cwl2wdl.loaders import load_file, load_text
+
+
+# A resolver names every document by a location string and provides:
+#
+#   location(name)             the location of a document given by name
+#   resolve(reference, base)   the location of an imported reference, relative
+#                              to the base of the importing document, or None
+#   base(location)             what references in the document are relative to
+#   load(location)             the loaded document
+#   version(location)          a value that changes along with the document, or
+#                              None if it can't be told (then nothing derived
+#                              from the document is kept between conversions)
+
+
+class FileResolver(object):
+    """Documents on the local filesystem, located by absolute path.
+
+    A reference is looked up relative to the working directory first and
+    then relative to the importing document. Given a root directory, only
+    documents under it (symbolic links resolved) are found and loaded.
+    Given a fingerprints dict, the [mtime, size, sha256] of every document
+    is stored in it by location before the document is first read, so an
+    edit made after that point never matches the stored fingerprint.
+    """
+    def __init__(self, root=None, fingerprints=None):
+        self.root = os.path.realpath(root) if root is not None else None
+        self.fingerprints = fingerprints
+
+    def allows(self, location):
+        """Whether the document at location may be read."""
+        if self.root is None:
+            return True
+        path = os.path.realpath(location)
+        return path == self.root or path.startswith(os.path.join(self.root, ""))
+
+    def location(self, name):
+        return os.path.abspath(name)
+
+    def resolve(self, reference, base):
+        for candidate in (reference, os.path.join(base, reference)):
+            if os.path.exists(candidate) and self.allows(candidate):
+                return os.path.abspath(candidate)
+        return None
+
+    def base(self, location):
+        return os.path.dirname(location)
+
+    def load(self, location):
+        if not self.allows(location):
+            raise IOError("%s is outside of %s" % (location, self.root))
+        if self.fingerprints is not None and location not in self.fingerprints:
+            from cwl2wdl.cache import fingerprint
+            self.fingerprints[location] = fingerprint(location)
+        return load_file(location)
+
+    def version(self, location):
+        try:
+            return os.stat(location).st_mtime
+        except OSError:
+            return None
+
+
+class MappingResolver(object):
+    """Documents held in memory, in a mapping of names to YAML or JSON text
+    or to already loaded documents.
+
+    Names are '/' separated paths, e.g. "tools/bwa-mem.cwl". A reference is
+    looked up as given first and then relative to the importing document.
+    Loaded documents are used as they are, never copied or modified.
+    """
+    def __init__(self, documents):
+        self.documents = dict((self.location(name), document)
+                              for name, document in documents.items())
+
+    def location(self, name):
+        return posixpath.normpath(name)
+
+    def resolve(self, reference, base):
+        for candidate in (reference, posixpath.join(base, reference)):
+            candidate = self.location(candidate)
+            if candidate in self.documents:
+                return candidate
+        return None
+
+    def base(self, location):
+        return posixpath.dirname(location)
+
+    def load(self, location):
+        try:
+            document = self.documents[location]
+        except KeyError:
+            raise IOError("No such document: %s" % (location))
+        if isinstance(document, bytes):
+            document = document.decode("utf-8")
+        if isinstance(document, (dict, list)):
+            return document
+        with tracing.span("load %s" % (posixpath.basename(location)), "load"):
+            return load_text(document)
+
+    def version(self, location):
+        return None
+
+
+class ArchiveResolver(MappingResolver):
+    """Documents in a zip or tar archive, located by member name and read
+    straight from the archive when first loaded."""
+    def __init__(self, archive):
+        # only needed for archives, and slow to import
+        import tarfile
+        import zipfile
+        self.archive = archive
+        self.__lock = threading.Lock()
+        if zipfile.is_zipfile(archive):
+            self.__zip = zipfile.ZipFile(archive)
+            self.__tar = None
+            names = [info.filename for info in self.__zip.infolist()
+                     if not info.filename.endswith("/")]
+        else:
+            self.__zip = None
+            self.__tar = tarfile.open(archive)
+            names = [info.name for info in self.__tar.getmembers() if info.isfile()]
+        # members are read on demand
+        MappingResolver.__init__(self, dict((name, name) for name in names))
+
+    def load(self, location):
+        try:
+            member = self.documents[location]
+        except KeyError:
+            raise IOError("No such document in %s: %s" % (self.archive, location))
+        with tracing.span("load %s" % (posixpath.basename(location)), "load"):
+            # neither archive type supports concurrent reads
+            with self.__lock:
+                if self.__zip is not None:
+                    data = self.__zip.read(member)
+                else:
+                    data = self.__tar.extractfile(member).read()
+            tracing.count("bytes parsed", len(data))
+            return load_text(data.decode("utf-8"))
+
+    def close(self):
+        if self.__zip is not None:
+            self.__zip.close()
+        else:
+            self.__tar.close()
@@ -0,0 +1,309 @@
+"""
+Long-running conversion server and its client.
+
+The server keeps the interpreter, PyYAML, PyWDL and the parser caches warm
+between requests. Requests are HTTP POSTs of a JSON object to /convert,
+served concurrently over localhost TCP or a Unix socket:
+
+    {"path": "/abs/path/tool.cwl"}
+    {"cwl": "<CWL text>", "base_dir": "/dir/for/imports", "name": "tool.cwl"}
+    {"cwl": "<CWL text>", "documents": {"tools/tool.cwl": "<CWL text>", ...}}
+
+In the last form imports are only looked up in "documents", by name
+relative to "name" (inline.cwl by default), and nothing is read from disk.
+
+Either form may add "validate": true. The response is a JSON object with
+the WDL text under "wdl" and the conversion warnings under "diagnostics",
+or an error message under "error".
+
+Every client that can connect is trusted with the files the server's user
+can read: path requests, base_dir and the imports of any request name files
+on the server. A Unix socket is only accessible to its owner (mode 0600),
+while any local user can connect to the TCP port. Serving with a root
+directory confines every file read to that directory.
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import socket
+import sys
+
+import argparse
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, UnixStreamServer
+    import http.client as httplib
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+    import httplib
+
+from cwl2wdl.diagnostics import Diagnostics
+from cwl2wdl.loaders import MultipleDocumentsError
+from cwl2wdl.main import (add_cache_args, cache_from_args, convert, parse_file,
+                          write_wdl, write_wdl_stream)
+from cwl2wdl.resolvers import FileResolver, MappingResolver
+from cwl2wdl.validation import parse_wdl
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class RequestError(Exception):
+    pass
+
+
+def convert_request(request, cache=None, root=None):
+    """Convert one decoded request and return the WDL text and the
+    Diagnostics of the conversion. Given a root directory, only files under
+    it are read."""
+    diagnostics = Diagnostics()
+    resolver = FileResolver(root) if root is not None else None
+    if "path" in request:
+        if resolver is not None and not resolver.allows(request["path"]):
+            raise RequestError("%s is outside of the served root." % (request["path"]))
+        if not os.path.exists(request["path"]):
+            raise RequestError("%s does not exist." % (request["path"]))
+        out = io.StringIO()
+        try:
+            write_wdl(parse_file(request["path"], cache, diagnostics, resolver), out)
+        except MultipleDocumentsError:
+            write_wdl_stream(request["path"], out, diagnostics, resolver)
+        wdl_doc = out.getvalue()
+    elif "cwl" in request and "documents" in request:
+        # imports are looked up in the documents sent along
+        wdl_doc = convert(request["cwl"], MappingResolver(request["documents"]),
+                          request.get("name", "inline.cwl"), diagnostics)
+    elif "cwl" in request:
+        # relative imports resolve against base_dir
+        base_dir = request.get("base_dir", root if root is not None else os.getcwd())
+        if resolver is not None and not resolver.allows(base_dir):
+            raise RequestError("%s is outside of the served root." % (base_dir))
+        filename = os.path.join(base_dir, request.get("name", "inline.cwl"))
+        if resolver is None:
+            resolver = FileResolver()
+        wdl_doc = convert(request["cwl"], resolver, filename, diagnostics)
+    else:
+        raise RequestError("Expected a 'path' or 'cwl' field.")
+
+    if request.get("validate"):
+        parse_wdl(wdl_doc)
+    return wdl_doc, diagnostics
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    # keep connections alive between requests of a client
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/convert":
+            self.__respond(404, {"error": "Unknown endpoint: %s" % (self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            if not isinstance(request, dict):
+                raise RequestError("Expected a JSON object.")
+        except (ValueError, RequestError) as e:
+            self.__respond(400, {"error": "Bad request: %s" % (e)})
+            return
+
+        try:
+            wdl_doc, diagnostics = convert_request(request, self.server.cache,
+                                                   self.server.root)
+        except RequestError as e:
+            self.__respond(400, {"error": str(e)})
+        except Exception as e:
+            self.__respond(500, {"error": "%s: %s" % (type(e).__name__, e)})
+        else:
+            self.__respond(200, {"wdl": wdl_doc,
+                                 "diagnostics": diagnostics.report()})
+
+    def __respond(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None,
+                cache=None, verbose=False, root=None):
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        # created owner-only, clients can read whatever the server can
+        umask = os.umask(0o177)
+        try:
+            server = ThreadingUnixHTTPServer(unix_socket, ConversionHandler)
+        finally:
+            os.umask(umask)
+    else:
+        server = ThreadingHTTPServer((host, port), ConversionHandler)
+    server.cache = cache
+    server.verbose = verbose
+    server.root = root
+    return server
+
+
+def collect_args():
+    parser = argparse.ArgumentParser(
+        prog="cwl2wdl serve",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser._optionals.title = "Options"
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST,
+                        help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="port to listen on")
+    parser.add_argument("--socket", type=str, default=None,
+                        help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--root", type=str, default=None, metavar="DIR",
+                        help="only read CWL files under DIR, for path requests "
+                        "and imports alike (path requests then bypass the "
+                        "document cache); by default clients may convert any "
+                        "file the server can read")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="log every request")
+    add_cache_args(parser)
+    return parser
+
+
+def cli(argv=None):
+    arguments = collect_args().parse_args(argv)
+    server = make_server(arguments.host, arguments.port, arguments.socket,
+                         cache_from_args(arguments), arguments.verbose,
+                         arguments.root)
+    # import PyWDL up front so the first validating request doesn't pay for it
+    import wdl.parser
+
+    if arguments.socket is not None:
+        print("Serving on %s" % (arguments.socket), file=sys.stderr)
+    else:
+        print("Serving on http://%s:%d" % server.server_address[:2], file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if arguments.socket is not None and os.path.exists(arguments.socket):
+            os.remove(arguments.socket)
+
+
+############################
+# Client
+############################
+class UnixHTTPConnection(httplib.HTTPConnection):
+    def __init__(self, unix_socket, timeout=None):
+        httplib.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.unix_socket = unix_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+class ConversionClient(object):
+    """Sends conversion requests to a running server over one connection."""
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None,
+                 timeout=None):
+        if unix_socket is not None:
+            self.connection = UnixHTTPConnection(unix_socket, timeout)
+        else:
+            self.connection = httplib.HTTPConnection(host, port, timeout=timeout)
+        # diagnostics report of the last successful conversion
+        self.diagnostics = None
+
+    def convert(self, request):
+        """Send a request dict and return the WDL text. Raises RequestError
+        with the server's message if the conversion failed."""
+        self.connection.request("POST", "/convert", json.dumps(request),
+                                {"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        body = json.loads(response.read().decode("utf-8"))
+        if response.status != 200:
+            raise RequestError(body.get("error", "HTTP %d" % (response.status)))
+        self.diagnostics = body.get("diagnostics")
+        return body["wdl"]
+
+    def convert_file(self, filename, inline=False, validate=False):
+        if inline:
+            with io.open(filename, encoding="utf-8") as handle:
+                request = {"cwl": handle.read(),
+                           "base_dir": os.path.dirname(os.path.abspath(filename)),
+                           "name": os.path.basename(filename)}
+        else:
+            request = {"path": os.path.abspath(filename)}
+        request["validate"] = validate
+        return self.convert(request)
+
+    def close(self):
+        self.connection.close()
+
+
+def collect_client_args():
+    parser = argparse.ArgumentParser(
+        prog="cwl2wdl-client",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser._optionals.title = "Options"
+    parser.add_argument("FILE", type=str, help="CWL file.")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST,
+                        help="address of the server")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="port of the server")
+    parser.add_argument("--socket", type=str, default=None,
+                        help="connect to this Unix socket instead of TCP")
+    parser.add_argument("--inline", action="store_true",
+                        help="send the CWL text instead of its path, for servers "
+                        "that can't read the file")
+    parser.add_argument("--validate", action="store_true",
+                        help="validate the resulting WDL code with PyWDL")
+    return parser
+
+
+def client_cli(argv=None):
+    arguments = collect_client_args().parse_args(argv)
+    client = ConversionClient(arguments.host, arguments.port, arguments.socket)
+    try:
+        wdl_doc = client.convert_file(arguments.FILE, arguments.inline,
+                                      arguments.validate)
+    except RequestError as e:
+        print("cwl2wdl-client: %s" % (e), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+    if client.diagnostics:
+        diagnostics = Diagnostics()
+        diagnostics.extend((d["code"], d["message"], d["location"], d["count"])
+                           for d in client.diagnostics["diagnostics"])
+        if len(diagnostics):
+            print(diagnostics.summary(), file=sys.stderr)
+    print(wdl_doc)
@@ -0,0 +1,253 @@
+"""
+Generator of synthetic CWL workflows, for scaling tests and benchmarks
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+import argparse
+
+
+class SyntheticWorkflow(object):
+    """Describes a synthetic workflow tree.
+
+    Every workflow has 'steps' tool steps. A step links its first input to
+    the outputs of up to 'fan_in' earlier steps, and each output feeds at
+    most 'fan_out' later steps; the other inputs come from the workflow
+    inputs. A 'scatter' fraction of the steps scatter their last input over
+    the workflow's File array, their outputs only feed workflow outputs.
+    'tools' tool files are shared round robin by the steps, and with
+    depth > 0 every workflow calls a nested workflow as its last step.
+    """
+    def __init__(self, steps=100, inputs=4, fan_in=1, fan_out=1, scatter=0.0,
+                 depth=0, tools=None):
+        if (steps < 1 or inputs < 1 or fan_in < 1 or fan_out < 1 or depth < 0 or
+                (tools is not None and tools < 1)):
+            raise ValueError("steps, inputs, fan_in, fan_out and tools must be "
+                             "positive and depth not negative.")
+        if not 0 <= scatter <= 1:
+            raise ValueError("scatter must be a fraction between 0 and 1.")
+        self.steps = steps
+        self.inputs = inputs
+        self.fan_in = fan_in
+        self.fan_out = fan_out
+        self.scatter = scatter
+        self.depth = depth
+        self.tools = tools if tools is not None else steps
+
+    def tool(self, t):
+        """The CWL document of tool t."""
+        if self.fan_in > 1:
+            first_type = {"type": "array", "items": "File"}
+        else:
+            first_type = "File"
+        return {
+            "cwlVersion": "draft-3",
+            "class": "CommandLineTool",
+            "id": "#tool_%d" % (t),
+            "baseCommand": ["tool_%d" % (t)],
+            "inputs": [{"id": "#in_%d" % (i),
+                        "type": first_type if i == 0 else "File",
+                        "inputBinding": {"prefix": "--in_%d" % (i),
+                                         "position": i + 1}}
+                       for i in range(self.inputs)],
+            "outputs": [{"id": "#out", "type": "File",
+                         "outputBinding": {"glob": "out_%d.txt" % (t)}}],
+        }
+
+    def workflow(self, level):
+        """The CWL document of the workflow at nesting level 'level'."""
+        # 'files' feeds scattered steps and first inputs taking arrays
+        has_files = self.scatter > 0 or self.fan_in > 1
+        scattered = self.__scattered()
+
+        inputs = [{"id": "#input_%d" % (i), "type": "File"}
+                  for i in range(self.inputs)]
+        if has_files:
+            inputs.append({"id": "#files", "type": {"type": "array", "items": "File"}})
+
+        steps = []
+        consumers = [0] * self.steps
+        # steps before the first one with spare capacity stay used up
+        first_free = [0]
+        for s in range(self.steps):
+            step_id = "step_%d" % (s)
+            upstream = self.__upstream(s, scattered, consumers, first_free)
+            for u in upstream:
+                consumers[u] += 1
+            if upstream:
+                first_source = ["#step_%d.out" % (u) for u in upstream]
+            else:
+                first_source = ["#files" if self.fan_in > 1 else "#input_0"]
+
+            step_inputs = []
+            for i in range(self.inputs):
+                step_input = {"id": "#%s.in_%d" % (step_id, i)}
+                if i == 0 and self.fan_in > 1:
+                    step_input["source"] = first_source
+                    step_input["linkMerge"] = "merge_flattened"
+                elif i == 0:
+                    step_input["source"] = first_source[0]
+                else:
+                    step_input["source"] = "#input_%d" % (i)
+                step_inputs.append(step_input)
+
+            step = {"id": "#%s" % (step_id),
+                    "run": "tool_%d.cwl" % (s % self.tools),
+                    "inputs": step_inputs,
+                    "outputs": [{"id": "#%s.out" % (step_id)}]}
+            if s in scattered:
+                scatter_input = step_inputs[-1]
+                scatter_input["source"] = "#files"
+                scatter_input.pop("linkMerge", None)
+                step["scatter"] = scatter_input["id"]
+            steps.append(step)
+
+        last = self.steps - 1
+        outputs = [{"id": "#result",
+                    "type": self.__output_type(last in scattered),
+                    "source": "#step_%d.out" % (last)}]
+        requirements = []
+        if scattered:
+            requirements.append({"class": "ScatterFeatureRequirement"})
+        if self.fan_in > 1:
+            requirements.append({"class": "MultipleInputFeatureRequirement"})
+
+        if level < self.depth:
+            requirements.append({"class": "SubworkflowFeatureRequirement"})
+            linked = max(s for s in range(self.steps) if s not in scattered) \
+                if len(scattered) < self.steps else None
+            sub_inputs = []
+            for i in range(self.inputs):
+                if i == 0 and linked is not None:
+                    source = "#step_%d.out" % (linked)
+                else:
+                    source = "#input_%d" % (i)
+                sub_inputs.append({"id": "#nested.input_%d" % (i), "source": source})
+            if has_files:
+                sub_inputs.append({"id": "#nested.files", "source": "#files"})
+            steps.append({"id": "#nested",
+                          "run": "workflow_%d.cwl" % (level + 1),
+                          "inputs": sub_inputs,
+                          "outputs": [{"id": "#nested.result"}]})
+            outputs.append({"id": "#nested_result",
+                            "type": self.__output_type(last in scattered),
+                            "source": "#nested.result"})
+
+        return {
+            "cwlVersion": "draft-3",
+            "class": "Workflow",
+            "id": "#workflow_%d" % (level),
+            "inputs": inputs,
+            "outputs": outputs,
+            "requirements": requirements,
+            "steps": steps,
+        }
+
+    def write(self, directory, fmt="json"):
+        """Write the tools and workflows into directory, as JSON or YAML.
+        Returns the path of the top-level workflow."""
+        if fmt not in ("json", "yaml"):
+            raise ValueError("Unknown format: %s" % (fmt))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        for t in range(min(self.tools, self.steps)):
+            _write_document(os.path.join(directory, "tool_%d.cwl" % (t)),
+                            self.tool(t), fmt)
+        for level in range(self.depth + 1):
+            _write_document(os.path.join(directory, "workflow_%d.cwl" % (level)),
+                            self.workflow(level), fmt)
+        return os.path.join(directory, "workflow_0.cwl")
+
+    ############################
+    # Helper functions
+    ############################
+    def __scattered(self):
+        """Indices of the scattered steps, spread evenly."""
+        count = int(round(self.steps * self.scatter))
+        if count == 0:
+            return set()
+        return set(int(k * self.steps / count) for k in range(count))
+
+    def __upstream(self, s, scattered, consumers, first_free):
+        # the earliest steps that still have capacity, so fan_out shapes
+        # the graph into a tree and fan_in joins its branches
+        while first_free[0] < s and (first_free[0] in scattered or
+                                     consumers[first_free[0]] >= self.fan_out):
+            first_free[0] += 1
+
+        upstream = []
+        for u in range(first_free[0], s):
+            if u not in scattered and consumers[u] < self.fan_out:
+                upstream.append(u)
+                if len(upstream) == self.fan_in:
+                    break
+        if not upstream:
+            # every output is used up, chain to the latest regular step
+            for u in range(s - 1, -1, -1):
+                if u not in scattered:
+                    return [u]
+        return upstream
+
+    def __output_type(self, is_scattered):
+        if is_scattered:
+            return {"type": "array", "items": "File"}
+        return "File"
+
+
+def _write_document(filename, document, fmt):
+    if fmt == "yaml":
+        import yaml
+        text = yaml.safe_dump(document, default_flow_style=False)
+    else:
+        text = json.dumps(document, indent=1)
+    with io.open(filename, "w", encoding="utf-8") as out:
+        out.write(text)
+
+
+def collect_args():
+    parser = argparse.ArgumentParser(
+        prog="cwl2wdl synthetic",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser._optionals.title = "Options"
+    parser.add_argument("OUTDIR", type=str,
+                        help="directory to write the CWL documents to")
+    parser.add_argument("--steps", type=int, default=100,
+                        help="tool steps per workflow")
+    parser.add_argument("--inputs", type=int, default=4,
+                        help="inputs per tool")
+    parser.add_argument("--fan-in", type=int, default=1,
+                        help="upstream outputs linked to each step")
+    parser.add_argument("--fan-out", type=int, default=1,
+                        help="downstream steps fed by each output")
+    parser.add_argument("--scatter", type=float, default=0.0,
+                        help="fraction of scattered steps")
+    parser.add_argument("--depth", type=int, default=0,
+                        help="levels of nested subworkflows")
+    parser.add_argument("--tools", type=int, default=None,
+                        help="distinct tools shared by the steps, one per step "
+                        "by default")
+    parser.add_argument("--format", type=str, default="json",
+                        choices=["json", "yaml"],
+                        help="format of the written documents")
+    return parser
+
+
+def cli(argv=None):
+    parser = collect_args()
+    arguments = parser.parse_args(argv)
+    try:
+        synthetic = SyntheticWorkflow(arguments.steps, arguments.inputs,
+                                      arguments.fan_in, arguments.fan_out,
+                                      arguments.scatter, arguments.depth,
+                                      arguments.tools)
+    except ValueError as e:
+        parser.error(str(e))
+    print(synthetic.write(arguments.OUTDIR, arguments.format))
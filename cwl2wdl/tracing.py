@@ -0,0 +1,149 @@
+"""
+Spans and counters of a conversion, written as Chrome trace-event JSON
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import threading
+import time
+
+
+class Tracer(object):
+    """Records complete ('X') events for spans and totals for counters.
+
+    The events can be loaded in chrome://tracing or https://ui.perfetto.dev;
+    the counters are written as counter ('C') events at the end of the trace.
+    """
+    def __init__(self):
+        self.events = []
+        self.counters = {}
+        self.pid = os.getpid()
+        self.__start = time.time()
+        self.__lock = threading.Lock()
+
+    def timestamp(self):
+        """Microseconds since the tracer was started."""
+        return (time.time() - self.__start) * 1e6
+
+    def add_span(self, name, category, start, args):
+        event = {"name": name, "cat": category, "ph": "X",
+                 "ts": start, "dur": self.timestamp() - start,
+                 "pid": self.pid, "tid": threading.current_thread().ident}
+        if args:
+            event["args"] = args
+        # list.append is atomic, spans may end in the prefetch threads
+        self.events.append(event)
+
+    def count(self, name, value=1):
+        with self.__lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def peak(self, name, value):
+        with self.__lock:
+            self.counters[name] = max(self.counters.get(name, value), value)
+
+    def trace(self):
+        """The trace as a dict in the trace-event format."""
+        end = self.timestamp()
+        counters = [{"name": name, "ph": "C", "ts": end, "pid": self.pid,
+                     "args": {"value": value}}
+                    for name, value in sorted(self.counters.items())]
+        return {"traceEvents": self.events + counters,
+                "displayTimeUnit": "ms",
+                "otherData": {"counters": self.counters}}
+
+    def write(self, filename):
+        with io.open(filename, "w", encoding="utf-8") as out:
+            out.write(json.dumps(self.trace()))
+
+    def summary(self):
+        """Total time, calls and share of each span name, the slowest first,
+        followed by the counters."""
+        totals = {}
+        for event in self.events:
+            total = totals.setdefault((event["cat"], event["name"]), [0.0, 0])
+            total[0] += event["dur"]
+            total[1] += 1
+
+        wall = self.timestamp()
+        lines = ["%-12s %-40s %10s %7s %6s" % ("category", "span", "total", "calls", "%")]
+        for (category, name), (duration, calls) in sorted(totals.items(),
+                                                          key=lambda t: -t[1][0]):
+            lines.append("%-12s %-40s %7.1f ms %7d %5.1f%%" %
+                         (category, name[:40], duration / 1000, calls,
+                          100 * duration / wall if wall else 0))
+        for name, value in sorted(self.counters.items()):
+            lines.append("%-53s %10d" % (name, value))
+        return "\n".join(lines)
+
+
+class _Span(object):
+    __slots__ = ("tracer", "name", "category", "args", "start")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer.timestamp()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add_span(self.name, self.category, self.start, self.args)
+        return False
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+# the active tracer, None while tracing is off
+_tracer = None
+
+
+def start():
+    """Start recording spans and counters. Returns the Tracer."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop():
+    """Stop recording and return the Tracer, or None if none was active."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name, category="convert", **args):
+    """Context manager timing the enclosed block. Costs a function call and
+    an attribute lookup while tracing is off."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, category, args)
+
+
+def count(name, value=1):
+    if _tracer is not None:
+        _tracer.count(name, value)
+
+
+def peak(name, value):
+    """Keep the largest value seen for a counter, e.g. a depth."""
+    if _tracer is not None:
+        _tracer.peak(name, value)
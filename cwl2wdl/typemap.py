@@ -0,0 +1,115 @@
+"""
+Resolution of CWL type expressions to WDL types
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+# CWL primitive type -> WDL type
+PRIMITIVE_TYPES = {"File": "File",
+                   "string": "String",
+                   "boolean": "Boolean",
+                   "int": "Int",
+                   "long": "Float",
+                   "float": "Float",
+                   "double": "Float"}
+
+# WDL (draft-2) has neither enums nor structs
+ENUM_TYPE = "String"
+RECORD_TYPE = "Object"
+
+# canonical signature -> (WDL type, is_required)
+_resolved = {}
+# type name, or tuple of the type names of a union -> (WDL type, is_required)
+_resolved_names = {}
+
+
+def clear_resolved_types():
+    _resolved.clear()
+    _resolved_names.clear()
+
+
+def canonical_type(cwl_type):
+    """The signature of a CWL type expression, a string or nested tuples
+    that tell apart exactly what matters to the WDL type:
+
+        "File"                                          -> "File"
+        "File[]", {"type": "array", "items": "File"}    -> ("array", "File")
+        "File?", ["null", "File"]                       -> ("optional", "File")
+        {"type": "enum", ...}                           -> ("enum",)
+        {"type": "record", ...}                         -> ("record",)
+
+    Of a union, only the first type other than null is kept.
+    """
+    if isinstance(cwl_type, str):
+        if cwl_type.endswith("?"):
+            return ("optional", canonical_type(cwl_type[:-1]))
+        if cwl_type.endswith("[]"):
+            return ("array", canonical_type(cwl_type[:-2]))
+        return cwl_type
+
+    elif isinstance(cwl_type, list):
+        types = [t for t in cwl_type if t != "null"]
+        if not types:
+            return "null"
+        if len(types) < len(cwl_type):
+            return ("optional", canonical_type(types[0]))
+        return canonical_type(types[0])
+
+    elif isinstance(cwl_type, dict):
+        kind = cwl_type.get("type")
+        if kind == "array":
+            return ("array", canonical_type(cwl_type["items"]))
+        elif kind in ("enum", "record"):
+            return (kind,)
+        return canonical_type(kind)
+
+    raise KeyError("Unrecognized CWL type: %s" % (cwl_type,))
+
+
+def resolve_type(cwl_type):
+    """Return the WDL type of a CWL type expression and whether a value is
+    required. Each distinct signature is resolved once per session; type
+    names and unions of names, most types in practice, skip working out
+    the signature as well."""
+    if isinstance(cwl_type, str):
+        key = cwl_type
+    elif isinstance(cwl_type, list) and all(isinstance(t, str) for t in cwl_type):
+        key = tuple(cwl_type)
+    else:
+        return resolve_signature(canonical_type(cwl_type))
+
+    resolved = _resolved_names.get(key)
+    if resolved is None:
+        resolved = _resolved_names[key] = resolve_signature(canonical_type(cwl_type))
+    return resolved
+
+
+def resolve_signature(signature):
+    """The WDL type and whether a value is required, of a signature returned
+    by canonical_type."""
+    resolved = _resolved.get(signature)
+    if resolved is None:
+        resolved = _resolved[signature] = _resolve(signature)
+    return resolved
+
+
+def _resolve(signature):
+    if isinstance(signature, tuple):
+        kind = signature[0]
+        if kind == "optional":
+            return _resolve(signature[1])[0], False
+        elif kind == "array":
+            items, items_required = _resolve(signature[1])
+            return "Array[%s%s]" % (items, "" if items_required else "?"), True
+        elif kind == "enum":
+            return ENUM_TYPE, True
+        elif kind == "record":
+            return RECORD_TYPE, True
+
+    elif signature in PRIMITIVE_TYPES:
+        return PRIMITIVE_TYPES[signature], True
+
+    raise KeyError("Unrecognized CWL type: %s" % (signature,))
@@ -0,0 +1,202 @@
+"""
+Validation of generated WDL with PyWDL
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import glob
+import hashlib
+import io
+import json
+import os
+import time
+
+from cwl2wdl import tracing, wdl_model
+from cwl2wdl.cache import DEFAULT_MAX_SIZE, evict_least_recent
+from cwl2wdl.generators import WdlTaskGenerator, WdlWorkflowGenerator
+
+
+TaskValidation = collections.namedtuple(
+    "TaskValidation", ["name", "error", "seconds", "cached"]
+)
+
+
+class ValidationError(Exception):
+    pass
+
+
+def parse_wdl(wdl_doc):
+    """Parse wdl_doc with PyWDL, raising on syntax errors. The parse tree can
+    be reused, e.g. for dumping the AST."""
+    with tracing.span("validate", "validate"):
+        import wdl.parser
+        return wdl.parser.parse(wdl_doc)
+
+
+def text_digest(wdl_text):
+    return hashlib.sha256(wdl_text.encode("utf-8")).hexdigest()
+
+
+_pywdl_version = None
+
+
+def pywdl_version():
+    """Version of the installed PyWDL, told without importing it."""
+    global _pywdl_version
+    if _pywdl_version is None:
+        try:
+            try:
+                from importlib.metadata import version
+            except ImportError:
+                from pkg_resources import get_distribution
+                _pywdl_version = get_distribution("wdl").version
+            else:
+                _pywdl_version = version("wdl")
+        except Exception:
+            # not installed, validating will fail anyway
+            _pywdl_version = "unknown"
+    return _pywdl_version
+
+
+class ValidationCache(object):
+    """Validation results keyed by the hash of the validated text. Kept in
+    memory, and on disk as well when cache_dir is given. On disk results
+    are also keyed by the PyWDL version, and the least recently used ones
+    are evicted once they take more than max_size bytes."""
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.results = {}
+        self.__size = None
+
+    def get(self, digest):
+        if digest in self.results:
+            return self.results[digest]
+        if self.cache_dir is None:
+            return None
+        entry_file = self.__entry_file(digest)
+        try:
+            with io.open(entry_file, encoding="utf-8") as handle:
+                error = json.load(handle)["error"]
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        # bump the mtime, which orders entries for eviction
+        try:
+            os.utime(entry_file, None)
+        except OSError:
+            pass
+        self.results[digest] = (error,)
+        return self.results[digest]
+
+    def put(self, digest, error):
+        self.results[digest] = (error,)
+        if self.cache_dir is None:
+            return
+        data = json.dumps({"error": error})
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with io.open(self.__entry_file(digest), "w", encoding="utf-8") as handle:
+                handle.write(data)
+        except (IOError, OSError):
+            return
+
+        if self.__size is not None:
+            self.__size += len(data)
+        if self.__size is None or self.__size > self.max_size:
+            self.__size = evict_least_recent(
+                glob.glob(os.path.join(self.cache_dir, "*")), self.max_size)
+
+    def __entry_file(self, digest):
+        key = hashlib.sha256(("%s\0%s" % (pywdl_version(), digest)).encode("utf-8"))
+        return os.path.join(self.cache_dir, key.hexdigest())
+
+
+def wdl_fragments(parsed_cwl):
+    """Yield (name, text) for every task and workflow of a ParsedDocument,
+    each rendered on its own. Definitions called by several steps are
+    yielded once."""
+    seen = set()
+    pending = []
+    if parsed_cwl.tasks is not None:
+        for task in parsed_cwl.tasks:
+            if id(task) not in seen:
+                seen.add(id(task))
+                pending.append(("task", task))
+    if parsed_cwl.workflow is not None:
+        pending.append(("workflow", parsed_cwl.workflow))
+
+    while pending:
+        kind, definition = pending.pop(0)
+        out = io.StringIO()
+        if kind == "task":
+            WdlTaskGenerator(definition).generate_wdl(out)
+        else:
+            wdl_model.WdlPrinter(out).write(WdlWorkflowGenerator(definition).build())
+            for step in definition.steps + definition.subworkflows:
+                if step.task_definition is not None and id(step.task_definition) not in seen:
+                    seen.add(id(step.task_definition))
+                    pending.append((step.step_type, step.task_definition))
+        yield "%s %s" % (kind, definition.name), out.getvalue()
+
+
+def _validate_fragment(fragment):
+    name, wdl_text = fragment
+    start = time.time()
+    try:
+        parse_wdl(wdl_text)
+        error = None
+    except Exception as e:
+        error = "%s: %s" % (type(e).__name__, e)
+    return TaskValidation(name, error, time.time() - start, False)
+
+
+def validate_fragments(fragments, jobs=1, cache=None):
+    """Validate (name, text) fragments independently, in up to jobs worker
+    processes. Returns a TaskValidation per fragment, in order. Identical
+    fragments are only validated once."""
+    if cache is None:
+        cache = ValidationCache()
+
+    results = []
+    todo = []
+    duplicates = []
+    pending = set()
+    for name, wdl_text in fragments:
+        digest = text_digest(wdl_text)
+        cached = cache.get(digest)
+        if cached is not None:
+            tracing.count("validation cache hits")
+            results.append(TaskValidation(name, cached[0], 0.0, True))
+        elif digest in pending:
+            results.append(None)
+            duplicates.append((len(results) - 1, digest, name))
+        else:
+            results.append(None)
+            pending.add(digest)
+            todo.append((len(results) - 1, digest, (name, wdl_text)))
+
+    if jobs > 1 and len(todo) > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(min(jobs, len(todo)))
+        try:
+            validated = pool.map(_validate_fragment, [t[2] for t in todo])
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        validated = [_validate_fragment(t[2]) for t in todo]
+
+    for (index, digest, fragment), result in zip(todo, validated):
+        cache.put(digest, result.error)
+        results[index] = result
+
+    for index, digest, name in duplicates:
+        results[index] = TaskValidation(name, cache.get(digest)[0], 0.0, True)
+    return results
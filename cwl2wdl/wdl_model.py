@@ -0,0 +1,191 @@
+"""
+Lightweight WDL document model and its pretty printer
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+class Import(object):
+    """`import "uri" as namespace`"""
+    def __init__(self, uri, namespace):
+        self.uri = uri
+        self.namespace = namespace
+
+
+class Declaration(object):
+    """`Type name` or `Type name = expression`"""
+    def __init__(self, variable_type, name, expression=None):
+        self.variable_type = variable_type
+        self.name = name
+        self.expression = expression
+
+
+class Command(object):
+    """Command parts, rendered one per line joined with line continuations."""
+    def __init__(self, parts):
+        self.parts = parts
+
+
+class Runtime(object):
+    """Ordered list of (key, value) runtime attributes."""
+    def __init__(self, attributes):
+        self.attributes = attributes
+
+
+class Task(object):
+    def __init__(self, name, inputs, command, outputs, runtime):
+        self.name = name
+        self.inputs = inputs
+        self.command = command
+        self.outputs = outputs
+        self.runtime = runtime
+
+
+class Call(object):
+    """Call of a task, with (name, value) input bindings."""
+    def __init__(self, task_name, inputs, alias=None):
+        self.task_name = task_name
+        self.inputs = inputs
+        self.alias = alias
+
+
+class Scatter(object):
+    """Scatter block. Every (item, collection) pair opens one block, nested
+    in order, around the body nodes."""
+    def __init__(self, variables, body):
+        self.variables = variables
+        self.body = body
+
+
+class WorkflowOutputs(object):
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+
+class Workflow(object):
+    def __init__(self, name, inputs, body, outputs):
+        self.name = name
+        self.inputs = inputs
+        self.body = body
+        self.outputs = outputs
+
+
+class WdlPrinter(object):
+    """Renders WDL nodes to a file-like object in a single pass."""
+    indentation = "    "
+
+    def __init__(self, out):
+        self.out = out
+        self.level = 0
+        self.__writers = {Import: self.__write_import,
+                          Task: self.__write_task,
+                          Workflow: self.__write_workflow,
+                          Declaration: self.__write_declaration,
+                          Call: self.__write_call,
+                          Scatter: self.__write_scatter,
+                          WorkflowOutputs: self.__write_workflow_outputs}
+
+    def write(self, node):
+        self.__writers[type(node)](node)
+
+    def __line(self, text=""):
+        if text:
+            self.out.write(self.indentation * self.level + text + "\n")
+        else:
+            self.out.write("\n")
+
+    def __open(self, header):
+        self.__line(header + " {")
+        self.level += 1
+
+    def __close(self):
+        self.level -= 1
+        self.__line("}")
+
+    def __write_import(self, node):
+        self.__line('import "%s" as %s' % (node.uri, node.namespace))
+
+    def __write_declaration(self, declaration):
+        if declaration.expression is None:
+            self.__line("%s %s" % (declaration.variable_type, declaration.name))
+        else:
+            self.__line("%s %s = %s" % (declaration.variable_type,
+                                        declaration.name,
+                                        declaration.expression))
+
+    def __write_task(self, task):
+        self.__line()
+        self.__open("task %s" % (task.name))
+        for declaration in task.inputs:
+            self.write(declaration)
+
+        self.__line()
+        self.__open("command")
+        parts = task.command.parts
+        for i, part in enumerate(parts):
+            self.__line(part + (" \\" if i < len(parts) - 1 else ""))
+        self.__close()
+
+        if task.outputs:
+            self.__line()
+            self.__open("output")
+            for declaration in task.outputs:
+                self.write(declaration)
+            self.__close()
+
+        if task.runtime is not None and task.runtime.attributes:
+            self.__line()
+            self.__open("runtime")
+            for key, value in task.runtime.attributes:
+                self.__line("%s: '%s'" % (key, value))
+            self.__close()
+        self.__close()
+
+    def __write_workflow(self, workflow):
+        self.__line()
+        self.__open("workflow %s" % (workflow.name))
+        for declaration in workflow.inputs:
+            self.write(declaration)
+        for node in workflow.body:
+            self.__line()
+            self.write(node)
+        if workflow.outputs is not None:
+            self.__line()
+            self.write(workflow.outputs)
+        self.__close()
+
+    def __write_call(self, call):
+        header = "call %s" % (call.task_name)
+        if call.alias is not None:
+            header += " as %s" % (call.alias)
+        if not call.inputs:
+            self.__line(header)
+            return
+
+        self.__open(header)
+        bindings = ["%s=%s" % (name, value) for name, value in call.inputs]
+        self.__line("input: " + bindings[0] + ("," if len(bindings) > 1 else ""))
+        for i, binding in enumerate(bindings[1:], 2):
+            self.__line("       " + binding + ("," if i < len(bindings) else ""))
+        self.__close()
+
+    def __write_scatter(self, scatter):
+        for item, collection in scatter.variables:
+            self.__open("scatter (%s in %s)" % (item, collection))
+        for i, node in enumerate(scatter.body):
+            if i > 0:
+                self.__line()
+            self.write(node)
+        for _ in scatter.variables:
+            self.__close()
+
+    def __write_workflow_outputs(self, outputs):
+        self.__open("output")
+        for output in outputs.outputs:
+            if isinstance(output, Declaration):
+                self.write(output)
+            else:
+                self.__line(output)
+        self.__close()
@@ -24,10 +24,11 @@ setup(
         'Topic :: Scientific/Engineering :: Bio-Informatics',
     ],
     keywords='workflow tool',
-    install_requires=["wdl==1.0.22"],
+    install_requires=["PyYAML", "wdl==1.0.22"],
     entry_points={
         'console_scripts': [
-            'cwl2wdl=cwl2wdl.main:cli'
+            'cwl2wdl=cwl2wdl.main:cli',
+            'cwl2wdl-client=cwl2wdl.server:client_cli'
         ]
     },
     # Use setuptools_scm to set the version number automatically from Git
@@ -0,0 +1,41 @@
+from __future__ import unicode_literals
+
+import io
+import os
+import re
+
+from cwl2wdl.main import parse_file, write_wdl
+
+
+WORKFLOWS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "cwl", "workflows")
+
+
+def convert(filename):
+    out = io.StringIO()
+    write_wdl(parse_file(os.path.join(WORKFLOWS, filename)), out)
+    return out.getvalue()
+
+
+def call_inputs(wdl):
+    """{call name or alias: {input: value}} of the calls in wdl."""
+    calls = {}
+    for name, alias, body in re.findall(
+            r"call (\S+)(?: as (\S+))? \{\s*input: ([^}]*)\}", wdl):
+        calls[alias or name] = dict(i.strip().split("=", 1) for i in body.split(","))
+    return calls
+
+
+def test_v1_step_sources():
+    # not packed, sources are step/output rather than main/step/output
+    assert call_inputs(convert(os.path.join("sort-uniq", "sort-uniq.cwl"))) == {
+        "sort": {"infile": "lines", "reverse": "reverse"},
+        "uniq": {"infile": "sort.sorted"}
+    }
+
+
+def test_packed_step_sources():
+    assert call_inputs(convert(os.path.join("packed", "sort-uniq-packed.cwl"))) == {
+        "sort": {"infile": "lines", "reverse": "reverse"},
+        "uniq": {"infile": "sort.sorted"}
+    }
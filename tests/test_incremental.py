@@ -0,0 +1,107 @@
+from __future__ import unicode_literals
+
+import io
+import os
+
+from cwl2wdl import batch
+from cwl2wdl.incremental import BuildState, STATE_FILENAME
+
+
+TOOL = """cwlVersion: v1.0
+class: CommandLineTool
+requirements:
+- $import: ../lib/docker.cwl
+baseCommand: %s
+inputs:
+- id: message
+  type: string
+  inputBinding:
+    position: 1
+outputs: []
+"""
+
+FRAGMENT = """class: DockerRequirement
+dockerPull: %s
+"""
+
+
+def write(path, text):
+    with io.open(str(path), "w", encoding="utf-8") as handle:
+        handle.write(text)
+
+
+def make_tree(tmpdir):
+    """Two tools importing the same requirement fragment, kept out of the
+    converted tree."""
+    source = tmpdir.mkdir("src")
+    write(tmpdir.mkdir("lib").join("docker.cwl"), FRAGMENT % ("ubuntu:16.04"))
+    write(source.join("echo.cwl"), TOOL % ("echo"))
+    write(source.join("printf.cwl"), TOOL % ("printf"))
+    return str(source), str(tmpdir.join("out")), str(tmpdir.join("lib", "docker.cwl"))
+
+
+def convert(paths, outdir):
+    state = BuildState(os.path.join(outdir, STATE_FILENAME))
+    results = list(batch.convert_changed(paths, outdir, state))
+    assert all(result.error is None for result in results)
+    return state, sorted(os.path.basename(result.source) for result in results)
+
+
+def test_unchanged_tree_is_not_reconverted(tmpdir):
+    source, outdir, fragment = make_tree(tmpdir)
+    assert convert([source], outdir)[1] == ["echo.cwl", "printf.cwl"]
+    assert convert([source], outdir)[1] == []
+
+
+def test_rebuilt_dependent_leaves_the_other_stale(tmpdir):
+    source, outdir, fragment = make_tree(tmpdir)
+    state = convert([source], outdir)[0]
+    echo, printf = [os.path.join(outdir, name) for name in ("echo.wdl", "printf.wdl")]
+
+    write(fragment, FRAGMENT % ("ubuntu:18.04"))
+    state.start_pass()
+    # echo.wdl is rebuilt against the new fragment, then checked in the same
+    # pass as printf.wdl, which still holds the old one
+    state.record(os.path.join(source, "echo.cwl"), echo,
+                 [os.path.join(source, "echo.cwl"), fragment])
+    assert not state.is_stale(os.path.join(source, "echo.cwl"), echo)
+    assert state.is_stale(os.path.join(source, "printf.cwl"), printf)
+
+
+def test_edit_during_conversion_is_seen(tmpdir, monkeypatch):
+    source, outdir, fragment = make_tree(tmpdir)
+    echo = os.path.join(source, "echo.cwl")
+    write_wdl = batch.write_wdl
+
+    def write_and_edit(parsed_cwl, out):
+        # saved after the fragment was read, before the output is recorded
+        write_wdl(parsed_cwl, out)
+        write(fragment, FRAGMENT % ("ubuntu:18.04"))
+
+    monkeypatch.setattr(batch, "write_wdl", write_and_edit)
+    assert convert([echo], outdir)[1] == ["echo.cwl"]
+    monkeypatch.setattr(batch, "write_wdl", write_wdl)
+
+    assert convert([echo], outdir)[1] == ["echo.cwl"]
+    assert convert([echo], outdir)[1] == []
+
+
+def test_failed_conversion_keeps_the_earlier_output(tmpdir, monkeypatch):
+    source, outdir, fragment = make_tree(tmpdir)
+    echo = os.path.join(source, "echo.cwl")
+    convert([echo], outdir)
+    output = os.path.join(outdir, "echo.wdl")
+    with io.open(output, encoding="utf-8") as handle:
+        converted = handle.read()
+
+    def fail(parsed_cwl, out):
+        out.write("task")
+        raise ValueError("failed halfway")
+
+    monkeypatch.setattr(batch, "write_wdl", fail)
+    result = batch.convert_to_file((echo, output, None, False))
+    assert result.error == "ValueError: failed halfway"
+    with io.open(output, encoding="utf-8") as handle:
+        assert handle.read() == converted
+    # and the partial document was removed
+    assert sorted(os.listdir(outdir)) == sorted(["echo.wdl", STATE_FILENAME])
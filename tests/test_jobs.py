@@ -0,0 +1,49 @@
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+
+import pytest
+
+from cwl2wdl.jobs import write_inputs
+from cwl2wdl.main import parse_file
+
+
+TOOL = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    "cwl", "tools", "samtools-index.cwl")
+
+
+def inputs_of(tmpdir, job):
+    job_file = tmpdir.join("job.json")
+    job_file.write_text(job, encoding="utf-8")
+    out = io.StringIO()
+    write_inputs(parse_file(TOOL), str(job_file), out)
+    return out.getvalue()
+
+
+def test_json_job(tmpdir):
+    inputs = inputs_of(tmpdir, '{"input": [{"class": "File", "path": "a.txt"}], '
+                               '"bai": true}')
+    assert json.loads(inputs) == {
+        "samtools_index.input_variable": [str(tmpdir.join("a.txt"))],
+        "samtools_index.bai": True
+    }
+
+
+def test_yaml_inside_an_array(tmpdir):
+    # only turns out not to be JSON once the array is being written
+    inputs = inputs_of(tmpdir, '{"input": [{"class": "File", path: "a.txt"}]}')
+    assert json.loads(inputs) == {
+        "samtools_index.input_variable": [str(tmpdir.join("a.txt"))]
+    }
+
+
+def test_invalid_job_writes_nothing(tmpdir):
+    job_file = tmpdir.join("job.json")
+    job_file.write_text('{"input": [{"class": "File", "path": "a.txt"}, ',
+                        encoding="utf-8")
+    out = io.StringIO()
+    with pytest.raises(Exception):
+        write_inputs(parse_file(TOOL), str(job_file), out)
+    assert out.getvalue() == ""